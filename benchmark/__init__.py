@@ -0,0 +1,3 @@
+# Suíte de benchmark: semeia um banco com dados em escala configurável e
+# exercita todas as rotas de main.py em processo, via cliente ASGI.
+# Uso: python -m benchmark --help
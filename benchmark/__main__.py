@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmark.semear import ESCALAS, semear
+
+RAIZ = Path(__file__).resolve().parent.parent
+RESULTADOS = Path(__file__).resolve().parent / "resultados"
+URL_PADRAO = f"sqlite:///{RAIZ / 'benchmark' / 'youthdb_benchmark.sqlite3'}"
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def _escala(args):
+    escala = dict(ESCALAS[args.escala])
+    for chave in escala:
+        valor = getattr(args, chave, None)
+        if valor is not None:
+            escala[chave] = valor
+    return escala
+
+
+def _configurar_ambiente(args):
+    # A configuração do app é lida no import, então o ambiente vem antes
+    os.environ["DATABASE_URL"] = args.url
+    os.environ["DB_MODO"] = getattr(args, "modo", "sync")
+    sys.path.insert(0, str(RAIZ))
+    os.chdir(RAIZ)
+
+
+def comando_semear(args):
+    _configurar_ambiente(args)
+    resultado = semear(args.url, semente=args.semente, recriar=args.recriar, **_escala(args))
+    print(json.dumps(resultado, ensure_ascii=False))
+
+
+def comando_executar(args):
+    escala = _escala(args)
+    _configurar_ambiente(args)
+    if not args.sem_semear:
+        print(json.dumps(semear(args.url, semente=args.semente, recriar=args.recriar, **escala), ensure_ascii=False))
+
+    import main
+    from benchmark.carga import executar
+    from instrumentacao import metricas
+
+    inicio = time.time()
+    cenarios = asyncio.run(executar(main.app, metricas, escala, args.requisicoes, args.concorrencia, args.filtro))
+    resultado = {
+        "commit": _commit_atual(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(inicio)),
+        "config": {
+            "url": args.url,
+            "modo": args.modo,
+            "escala": escala,
+            "requisicoes": args.requisicoes,
+            "concorrencia": args.concorrencia,
+        },
+        "cenarios": cenarios,
+    }
+    destino = Path(args.saida) if args.saida else RESULTADOS / f"{resultado['commit']}-{args.modo}-{args.escala}.json"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(f"Resultados salvos em {destino}")
+
+
+def comando_serializacao(args):
+    escala = _escala(args)
+    _configurar_ambiente(args)
+    if not args.sem_semear:
+        print(json.dumps(semear(args.url, semente=args.semente, recriar=args.recriar, **escala), ensure_ascii=False))
+
+    import main
+    from benchmark.carga import comparar_serializacao
+
+    resultados = asyncio.run(comparar_serializacao(main.app, args.repeticoes))
+    # Falha se o caminho rápido divergir do padrão em alguma lista
+    sys.exit(0 if all(r["iguais"] for r in resultados.values()) else 1)
+
+
+def comando_comparar(args):
+    base = json.loads(Path(args.base).read_text())
+    atual = json.loads(Path(args.atual).read_text())
+    regressoes = 0
+    print(f"{'cenário':32s} {'p95 base':>10s} {'p95 atual':>10s} {'Δp95':>8s} {'req/s base':>11s} {'req/s atual':>11s} {'Δreq/s':>8s}")
+    for nome, novo in atual["cenarios"].items():
+        antigo = base["cenarios"].get(nome)
+        if not antigo:
+            continue
+        delta_p95 = (novo["p95_ms"] - antigo["p95_ms"]) / antigo["p95_ms"] * 100 if antigo["p95_ms"] else 0.0
+        delta_rps = (novo["req_por_s"] - antigo["req_por_s"]) / antigo["req_por_s"] * 100 if antigo["req_por_s"] else 0.0
+        regrediu = delta_p95 > args.tolerancia or delta_rps < -args.tolerancia
+        regressoes += regrediu
+        print(f"{nome:32s} {antigo['p95_ms']:>10.2f} {novo['p95_ms']:>10.2f} {delta_p95:>+7.1f}% "
+              f"{antigo['req_por_s']:>11.1f} {novo['req_por_s']:>11.1f} {delta_rps:>+7.1f}%"
+              + ("  <-- regressão" if regrediu else ""))
+    sys.exit(1 if regressoes else 0)
+
+
+def _argumentos_escala(parser):
+    parser.add_argument("--url", default=URL_PADRAO, help="URL SQLAlchemy (SQLite local ou MySQL)")
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--recriar", action="store_true", help="apaga e recria as tabelas antes de semear")
+    for chave in ESCALAS["pequena"]:
+        parser.add_argument(f"--{chave}", type=int)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark da API do Youth Space.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_semear = sub.add_parser("semear", help="popula o banco de benchmark")
+    _argumentos_escala(p_semear)
+    p_semear.set_defaults(funcao=comando_semear)
+
+    p_executar = sub.add_parser("executar", help="semeia (se vazio) e mede todas as rotas")
+    _argumentos_escala(p_executar)
+    p_executar.add_argument("--modo", choices=["async", "sync"], default="async", help="DB_MODO do app")
+    p_executar.add_argument("--requisicoes", type=int, default=200, help="requisições por cenário")
+    p_executar.add_argument("--concorrencia", type=int, default=10)
+    p_executar.add_argument("--filtro", help="só cenários cujo nome contém este texto")
+    p_executar.add_argument("--sem-semear", action="store_true")
+    p_executar.add_argument("--saida", help="arquivo JSON de saída")
+    p_executar.set_defaults(funcao=comando_executar)
+
+    p_serializacao = sub.add_parser("serializacao", help="compara a saída e o tempo das listas com e sem ?rapido=true")
+    _argumentos_escala(p_serializacao)
+    p_serializacao.add_argument("--modo", choices=["async", "sync"], default="async", help="DB_MODO do app")
+    p_serializacao.add_argument("--repeticoes", type=int, default=20, help="requisições por lista e caminho")
+    p_serializacao.add_argument("--sem-semear", action="store_true")
+    p_serializacao.set_defaults(funcao=comando_serializacao)
+
+    p_comparar = sub.add_parser("comparar", help="compara dois resultados JSON")
+    p_comparar.add_argument("base")
+    p_comparar.add_argument("atual")
+    p_comparar.add_argument("--tolerancia", type=float, default=10.0, help="variação aceita, em %%")
+    p_comparar.set_defaults(funcao=comando_comparar)
+
+    args = parser.parse_args()
+    args.funcao(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+# Cenários: (nome, método, função que gera (caminho, kwargs) a partir do
+# estado). O estado guarda a escala do banco e os ids criados pelos
+# cenários de escrita, que os cenários de remoção consomem depois.
+
+
+class Estado:
+    def __init__(self, escala, semente=7):
+        self.escala = escala
+        self.rng = random.Random(semente)
+        self.sequencia = 0
+        self.criados = {"alunos": [], "cursos": [], "turmas": [], "matriculas": []}
+
+    def id(self, entidade):
+        return self.rng.randint(1, self.escala[entidade])
+
+    def unico(self, prefixo):
+        self.sequencia += 1
+        return f"{prefixo}-{self.sequencia}-{self.rng.randrange(10**9)}"
+
+    def consumir(self, entidade):
+        criados = self.criados[entidade]
+        return criados.pop() if criados else 10**9
+
+
+def _csv_alunos(estado, linhas=50):
+    corpo = ["nome,email,senha"]
+    for _ in range(linhas):
+        unico = estado.unico("import")
+        corpo.append(f"{unico},{unico}@bench.io,{unico}")
+    return "\n".join(corpo) + "\n"
+
+
+def _horario_aleatorio(estado):
+    hora = estado.rng.randrange(7, 21)
+    return f"{estado.rng.choice(['seg', 'ter', 'qua', 'qui', 'sex'])} {hora:02d}:00-{hora + 2:02d}:00"
+
+
+CENARIOS_LEITURA = [
+    ("login_page", "GET", lambda e: ("/login", {})),
+    ("home", "GET", lambda e: ("/home", {})),
+    ("professores_lista", "GET", lambda e: ("/professores/", {})),
+    ("professor", "GET", lambda e: (f"/professores/{e.id('professores')}", {})),
+    ("alunos_lista", "GET", lambda e: ("/alunos/", {})),
+    ("alunos_lista_skip_profundo", "GET", lambda e: (f"/alunos/?skip={max(e.escala['alunos'] - 200, 0)}", {})),
+    ("alunos_lista_status", "GET", lambda e: ("/alunos/?status=inativo", {})),
+    ("aluno", "GET", lambda e: (f"/alunos/{e.id('alunos')}", {})),
+    ("cursos_lista", "GET", lambda e: ("/cursos/", {})),
+    ("curso", "GET", lambda e: (f"/cursos/{e.id('cursos')}", {})),
+    ("turmas_lista", "GET", lambda e: ("/turmas/", {})),
+    ("turma", "GET", lambda e: (f"/turmas/{e.id('turmas')}", {})),
+    ("matriculas_lista", "GET", lambda e: ("/matriculas/", {})),
+    ("matriculas_lista_1000", "GET", lambda e: ("/matriculas/?limit=1000", {})),
+    ("matriculas_lista_1000_rapido", "GET", lambda e: ("/matriculas/?limit=1000&rapido=true", {})),
+    ("turmas_lista_1000_rapido", "GET", lambda e: ("/turmas/?limit=1000&rapido=true", {})),
+    ("matriculas_exportar_turma", "GET", lambda e: (f"/matriculas/exportar?id_turma={e.id('turmas')}", {})),
+    ("alunos_por_turma", "GET", lambda e: (f"/turmas/{e.id('turmas')}/alunos", {})),
+    ("turmas_por_aluno", "GET", lambda e: (f"/alunos/{e.id('alunos')}/turmas", {})),
+    ("turmas_por_professor", "GET", lambda e: (f"/professores/{e.id('professores')}/turmas", {})),
+    ("rosters_lote", "GET", lambda e: ("/turmas/alunos/lote", {"params": [("ids", e.id("turmas")) for _ in range(20)]})),
+    ("analises_curso", "GET", lambda e: ("/analises/matriculas?por=curso", {})),
+    ("analises_professor", "GET", lambda e: ("/analises/matriculas?por=professor", {})),
+    ("analises_status", "GET", lambda e: ("/analises/matriculas?por=status", {})),
+    ("analises_turma_1000", "GET", lambda e: ("/analises/matriculas?por=turma&limit=1000", {})),
+    ("busca", "GET", lambda e: ("/search", {"params": {"q": f"aluno {e.id('alunos')}"}})),
+    ("busca_ampla", "GET", lambda e: ("/search", {"params": {"q": "youth"}})),
+    ("admin_cache", "GET", lambda e: ("/admin/cache", {})),
+    ("admin_metricas", "GET", lambda e: ("/admin/metricas", {})),
+]
+
+CENARIOS_ESCRITA = [
+    ("login", "POST", lambda e: ("/login", {"data": {"email": f"aluno{e.id('alunos')}@youth.space", "senha": "x", "tipo": "aluno"}})),
+    ("register_aluno", "POST", lambda e: ("/register/aluno", {"data": {"nome": "n", "email": f"{e.unico('reg')}@bench.io", "senha": e.unico("s")}})),
+    ("aluno_criar", "POST", lambda e: ("/alunos/", {"json": {"nome": "n", "email": f"{e.unico('a')}@bench.io"}})),
+    ("aluno_criar_modal", "POST", lambda e: ("/alunos/create", {"json": {"nome": "n", "email": f"{e.unico('m')}@bench.io"}})),
+    ("aluno_atualizar", "PUT", lambda e: (f"/alunos/{e.id('alunos')}", {"json": {"status": "ativo"}})),
+    ("professor_criar", "POST", lambda e: ("/professores/", {"json": {"nome": "p", "email": f"{e.unico('p')}@bench.io"}})),
+    ("professor_atualizar", "PUT", lambda e: (f"/professores/{e.id('professores')}", {"json": {"especializacao": "Benchmark"}})),
+    ("curso_criar", "POST", lambda e: ("/cursos/", {"json": {"nome": e.unico("curso")}})),
+    ("turma_criar_horario", "POST", lambda e: ("/turmas/", {"json": {"id_curso": e.id("cursos"), "id_professor": e.id("professores"), "carga_horaria": 40, "sala": f"Sala {e.rng.randrange(40)}", "horario": _horario_aleatorio(e)}})),
+    ("grade_validar", "POST", lambda e: ("/turmas/validar-grade", {"json": {"turmas": [{"id_professor": e.id("professores"), "sala": f"Sala {e.rng.randrange(40)}", "horario": _horario_aleatorio(e)} for _ in range(200)]}})),
+    ("turma_criar", "POST", lambda e: ("/turmas/", {"json": {"id_curso": e.id("cursos"), "id_professor": e.id("professores"), "carga_horaria": 40}})),
+    ("matricula_criar", "POST", lambda e: ("/matriculas/", {"json": {"id_aluno": e.id("alunos"), "id_turma": e.id("turmas")}})),
+    # Pico de inscrição: todos os pedidos disputam a mesma turma
+    ("matricula_turma_popular", "POST", lambda e: ("/matriculas/fila", {"json": {"id_aluno": e.id("alunos"), "id_turma": 1}})),
+    ("matriculas_lote", "POST", lambda e: ("/matriculas/lote", {"json": {"id_alunos": [e.id("alunos") for _ in range(50)], "id_turmas": [e.id("turmas") for _ in range(2)]}})),
+    ("importacao_alunos", "POST", lambda e: ("/importacao/alunos", {"files": {"arquivo": ("alunos.csv", _csv_alunos(e))}})),
+]
+
+CENARIOS_REMOCAO = [
+    ("matricula_remover", "DELETE", lambda e: (f"/matriculas/{e.consumir('matriculas')}", {})),
+    ("turma_remover", "DELETE", lambda e: (f"/turmas/{e.consumir('turmas')}", {})),
+    ("curso_remover", "DELETE", lambda e: (f"/cursos/{e.consumir('cursos')}", {})),
+    ("aluno_remover", "DELETE", lambda e: (f"/alunos/{e.consumir('alunos')}", {})),
+]
+# Cada remoção só apaga o que os cenários de escrita criaram
+REMOCOES = {
+    "matricula_remover": "matriculas",
+    "turma_remover": "turmas",
+    "curso_remover": "cursos",
+    "aluno_remover": "alunos",
+}
+
+# Para os cenários de remoção: de onde tirar o id criado
+CRIACOES = {
+    "aluno_criar": ("alunos", "id_aluno"),
+    "curso_criar": ("cursos", "id_curso"),
+    "turma_criar": ("turmas", "id_turma"),
+    "matricula_criar": ("matriculas", "id_matricula"),
+}
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(int(round(p / 100 * (len(ordenados) - 1))), len(ordenados) - 1)
+    return ordenados[indice]
+
+
+def _total_consultas(metricas):
+    return sum(valores[1] for valores in metricas.instantaneo().values())
+
+
+async def executar_cenario(cliente, metricas, estado, nome, metodo, gerar, requisicoes, concorrencia):
+    latencias = []
+    codigos = Counter()
+    fila = asyncio.Queue()
+    for _ in range(requisicoes):
+        fila.put_nowait(gerar(estado))
+
+    async def trabalhador():
+        while not fila.empty():
+            caminho, kwargs = fila.get_nowait()
+            inicio = time.perf_counter()
+            resposta = await cliente.request(metodo, caminho, **kwargs)
+            await resposta.aread()
+            latencias.append(time.perf_counter() - inicio)
+            codigos[resposta.status_code] += 1
+            if nome in CRIACOES and resposta.status_code == 201:
+                entidade, chave = CRIACOES[nome]
+                estado.criados[entidade].append(resposta.json()[chave])
+
+    consultas_antes = _total_consultas(metricas)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    consultas = _total_consultas(metricas) - consultas_antes
+
+    return {
+        "metodo": metodo,
+        "requisicoes": requisicoes,
+        "concorrencia": concorrencia,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "media_ms": round(statistics.fmean(latencias) * 1000, 3) if latencias else 0.0,
+        "req_por_s": round(requisicoes / duracao, 2) if duracao else 0.0,
+        "consultas_por_req": round(consultas / requisicoes, 2) if requisicoes else 0.0,
+        "status": {str(codigo): total for codigo, total in sorted(codigos.items())},
+    }
+
+
+async def executar(app, metricas, escala, requisicoes=200, concorrencia=10, filtro=None, aquecimento=5):
+    estado = Estado(escala)
+    resultados = {}
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    # lifespan_context dispara os eventos de startup/shutdown da aplicação
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+            for nome, metodo, gerar in CENARIOS_LEITURA + CENARIOS_ESCRITA + CENARIOS_REMOCAO:
+                if filtro and filtro not in nome:
+                    continue
+                if metodo == "GET":
+                    for _ in range(aquecimento):
+                        caminho, kwargs = gerar(estado)
+                        await cliente.get(caminho, **kwargs)
+                quantidade = requisicoes
+                if nome in REMOCOES:
+                    quantidade = max(min(requisicoes, len(estado.criados[REMOCOES[nome]])), 1)
+                resultados[nome] = await executar_cenario(
+                    cliente, metricas, estado, nome, metodo, gerar, quantidade, concorrencia
+                )
+                print(f"{nome:32s} p50={resultados[nome]['p50_ms']:>9.2f}ms "
+                      f"p95={resultados[nome]['p95_ms']:>9.2f}ms "
+                      f"p99={resultados[nome]['p99_ms']:>9.2f}ms "
+                      f"{resultados[nome]['req_por_s']:>9.1f} req/s "
+                      f"{resultados[nome]['consultas_por_req']:>6.2f} consultas/req")
+    return resultados
+
+
+# Listas comparadas entre o caminho padrão (ORM + Pydantic) e o rápido (?rapido=true)
+LISTAS_SERIALIZACAO = [
+    "/professores/?limit=1000",
+    "/alunos/?limit=1000",
+    "/cursos/?limit=1000",
+    "/turmas/?limit=1000",
+    "/matriculas/?limit=1000",
+]
+
+
+async def comparar_serializacao(app, repeticoes=20):
+    resultados = {}
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+            for caminho in LISTAS_SERIALIZACAO:
+                padrao = await cliente.get(caminho)
+                rapido = await cliente.get(caminho + "&rapido=true")
+                tempos = {}
+                for variante, url in (("padrao", caminho), ("rapido", caminho + "&rapido=true")):
+                    latencias = []
+                    for _ in range(repeticoes):
+                        inicio = time.perf_counter()
+                        resposta = await cliente.get(url)
+                        await resposta.aread()
+                        latencias.append(time.perf_counter() - inicio)
+                    tempos[variante] = round(percentil(latencias, 50) * 1000, 3)
+                resultados[caminho] = {
+                    "itens": len(padrao.json()),
+                    "iguais": padrao.status_code == rapido.status_code and padrao.json() == rapido.json(),
+                    "bytes_iguais": padrao.content == rapido.content,
+                    "padrao_p50_ms": tempos["padrao"],
+                    "rapido_p50_ms": tempos["rapido"],
+                    "aceleracao": round(tempos["padrao"] / tempos["rapido"], 2) if tempos["rapido"] else 0.0,
+                }
+                r = resultados[caminho]
+                print(f"{caminho:32s} itens={r['itens']:>5d} iguais={str(r['iguais']):5s} "
+                      f"padrão={r['padrao_p50_ms']:>9.2f}ms rápido={r['rapido_p50_ms']:>9.2f}ms "
+                      f"{r['aceleracao']:>6.2f}x")
+    return resultados
@@ -0,0 +1,98 @@
+import random
+import time
+
+from sqlalchemy import create_engine, event, func, insert, select
+
+# Escalas prontas; cada valor pode ser sobrescrito pela linha de comando
+ESCALAS = {
+    "pequena": {"alunos": 2_000, "professores": 50, "cursos": 20, "turmas": 100, "matriculas": 20_000},
+    "media": {"alunos": 20_000, "professores": 200, "cursos": 60, "turmas": 500, "matriculas": 200_000},
+    "grande": {"alunos": 100_000, "professores": 500, "cursos": 100, "turmas": 2_000, "matriculas": 1_000_000},
+}
+
+TAMANHO_LOTE = 10_000
+STATUS_TURMA = ["inscrições abertas", "em andamento", "encerrada"]
+DIAS_SEMANA = ["seg", "ter", "qua", "qui", "sex"]
+
+
+def _otimizar_sqlite(motor):
+    # Só para a carga inicial: troca durabilidade por velocidade
+    @event.listens_for(motor, "connect")
+    def _pragmas(conexao, _):
+        cursor = conexao.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+
+def _inserir_em_lotes(conexao, tabela, linhas):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= TAMANHO_LOTE:
+            conexao.execute(insert(tabela), lote)
+            lote = []
+    if lote:
+        conexao.execute(insert(tabela), lote)
+
+
+def _matriculas(rng, alunos, turmas, total):
+    # Pares (aluno, turma) distintos: cada aluno recebe ~total/alunos turmas
+    por_aluno, resto = divmod(total, alunos)
+    for id_aluno in range(1, alunos + 1):
+        quantidade = min(por_aluno + (1 if id_aluno <= resto else 0), turmas)
+        for id_turma in rng.sample(range(1, turmas + 1), quantidade):
+            yield {"id_aluno": id_aluno, "id_turma": id_turma}
+
+
+def _horario(i):
+    # Cada sala recebe blocos de 2h distintos (seg-sex, 8h-22h) até lotar a semana
+    bloco = i // 40
+    dia, hora = DIAS_SEMANA[bloco % 5], 8 + 2 * (bloco // 5 % 7)
+    return f"{dia} {hora:02d}:00-{hora + 2:02d}:00"
+
+
+def semear(url, alunos, professores, cursos, turmas, matriculas, semente=42, recriar=False):
+    # models (via database.py) lê DATABASE_URL no import: só importa depois
+    # que a linha de comando já configurou o ambiente.
+    import models
+    import resumos
+
+    motor = create_engine(url)
+    if motor.dialect.name == "sqlite":
+        _otimizar_sqlite(motor)
+    if recriar:
+        models.Base.metadata.drop_all(motor)
+    models.Base.metadata.create_all(motor)
+
+    with motor.connect() as conexao:
+        existentes = conexao.execute(select(func.count()).select_from(models.Aluno)).scalar_one()
+    if existentes:
+        motor.dispose()
+        return {"semeado": False, "motivo": f"banco já tem {existentes} alunos (use --recriar)"}
+
+    rng = random.Random(semente)
+    inicio = time.perf_counter()
+    with motor.begin() as conexao:
+        _inserir_em_lotes(conexao, models.Professor.__table__, (
+            {"id_professor": i, "nome": f"Professor {i}", "email": f"professor{i}@youth.space",
+             "senha": f"senha-professor-{i}", "especializacao": f"Área {i % 25}"}
+            for i in range(1, professores + 1)))
+        _inserir_em_lotes(conexao, models.Curso.__table__, (
+            {"id_curso": i, "nome": f"Curso {i}", "descricao": f"Descrição do curso {i}"}
+            for i in range(1, cursos + 1)))
+        _inserir_em_lotes(conexao, models.Aluno.__table__, (
+            {"id_aluno": i, "nome": f"Aluno {i}", "email": f"aluno{i}@youth.space",
+             "senha": f"senha-aluno-{i}", "status": "ativo" if i % 10 else "inativo"}
+            for i in range(1, alunos + 1)))
+        _inserir_em_lotes(conexao, models.Turma.__table__, (
+            {"id_turma": i, "id_curso": rng.randint(1, cursos), "id_professor": rng.randint(1, professores),
+             "carga_horaria": rng.choice([20, 40, 60]), "horario": _horario(i), "sala": f"Sala {i % 40}",
+             "status": rng.choice(STATUS_TURMA)}
+            for i in range(1, turmas + 1)))
+    with motor.begin() as conexao:
+        _inserir_em_lotes(conexao, models.Matricula.__table__, _matriculas(rng, alunos, turmas, matriculas))
+    with motor.begin() as conexao:
+        resumos.reconstruir(conexao)
+    motor.dispose()
+    return {"semeado": True, "segundos": round(time.perf_counter() - inicio, 2)}
@@ -0,0 +1,438 @@
+import asyncio
+import heapq
+import logging
+import os
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+import models
+import versoes
+from database import SessionLocal
+
+# Busca textual em memória sobre alunos, professores e cursos.
+# Os textos são normalizados (minúsculas, sem acentos) e quebrados em
+# palavras (letras e números separados). As palavras de nome e descrição
+# entram num vocabulário ordenado (busca por prefixo) e num índice de
+# trigramas (busca por trecho). As de e-mail são quase uma por registro, então
+# ficam num vocabulário à parte, só com busca por prefixo e limitada a
+# MAX_EXPANSAO palavras por termo.
+# O índice é por processo: é reconstruído a partir do banco na inicialização
+# (em segundo plano) e mantido pelos handlers de criação/alteração/remoção e
+# pela importação. Para pegar as escritas de outros workers ele guarda as
+# versões de alunos, professores e cursos (versoes.py) lidas na carga e, a
+# cada BUSCA_INTERVALO_RECONSTRUCAO segundos, reconstrói se alguma mudou
+# (escritas do próprio worker também contam: no máximo uma reconstrução por
+# intervalo).
+
+logger = logging.getLogger(__name__)
+
+# "1": reconstrói o índice a partir do banco na inicialização, em segundo
+# plano (/search responde 503 até terminar)
+BUSCA_RECONSTRUIR = os.getenv("BUSCA_RECONSTRUIR", "1") == "1"
+# Intervalo, em segundos, da checagem de versões que reconstrói o índice
+# quando houve escritas (0 desliga)
+BUSCA_INTERVALO_RECONSTRUCAO = float(os.getenv("BUSCA_INTERVALO_RECONSTRUCAO", "30"))
+
+# tipo -> (modelo, coluna do id, campos indexados)
+TIPOS = {
+    "aluno": (models.Aluno, "id_aluno", ("nome", "email")),
+    "professor": (models.Professor, "id_professor", ("nome", "email")),
+    "curso": (models.Curso, "id_curso", ("nome", "descricao")),
+}
+# Tabelas de versoes.py acompanhadas pelo índice
+TABELAS = tuple(modelo.__tablename__ for modelo, _, _ in TIPOS.values())
+
+# Campos cujas palavras só são buscadas por prefixo
+CAMPOS_EMAIL = {"email"}
+
+_PALAVRA = re.compile(r"[^\W\d_]+|\d+")
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
+def palavras(texto):
+    return _PALAVRA.findall(normalizar(texto))
+
+
+def trigramas(palavra):
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+
+def _descartar(indice, chave, valor):
+    # Tira valor do conjunto indice[chave]; devolve False se o conjunto esvaziou
+    conjunto = indice[chave]
+    conjunto.discard(valor)
+    if conjunto:
+        return True
+    del indice[chave]
+    return False
+
+
+# Pontuação de cada faixa de relevância, da mais forte para a mais fraca
+PONTUACOES = {
+    "exato": 100,     # nome igual à consulta
+    "inicio": 50,     # o nome começa pelo primeiro termo
+    "prefixo": 30,    # todos os termos são início de alguma palavra
+    "trecho": 10,     # algum termo só aparece no meio de uma palavra
+}
+
+# Cada documento é identificado internamente por um inteiro que já é a sua
+# ordem dentro de uma faixa (nomes mais curtos primeiro, depois tipo e id):
+# assim os conjuntos guardam ints e a ordenação não precisa de key.
+_CODIGOS_TIPO = {tipo: codigo for codigo, tipo in enumerate(TIPOS)}
+_BITS_ID = 36
+_BITS_TIPO = 4
+
+# Termo muito comum (mais postings que isto vezes os candidatos restantes)
+# é conferido nas palavras de cada candidato em vez de virar uma união
+FATOR_FILTRO = 20
+# Palavras de e-mail alcançadas por um termo. Acima disso o termo é conferido
+# nos candidatos dos outros termos; sozinho, usa só as primeiras em ordem
+# alfabética (nomes e descrições entram sempre inteiros).
+MAX_EXPANSAO = int(os.getenv("BUSCA_MAX_EXPANSAO", "20000"))
+
+
+def _codigo(tipo, id_, nome):
+    return (min(len(nome), 4095) << (_BITS_ID + _BITS_TIPO)) | (_CODIGOS_TIPO[tipo] << _BITS_ID) | id_
+
+
+class IndiceBusca:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codigos = {}       # (tipo, id) -> código
+        # código -> (exibição, palavras, palavras de e-mail, nome, primeira
+        # palavra); as palavras ficam juntas numa string ("\0ana\0silva"),
+        # para conferir um termo num candidato com uma busca só
+        self._documentos = {}
+        self._textos = {}        # palavra de nome/descrição -> {código}
+        self._emails = {}        # palavra de e-mail -> {código}
+        self._iniciais = {}      # primeira palavra do nome -> {código}
+        self._nomes = {}         # nome normalizado -> {código}
+        self._trigramas = {}     # trigrama -> {palavra de nome/descrição}
+        self._vocabulario = []   # palavras de nome/descrição ordenadas
+        self._vocabulario_email = []  # palavras de e-mail ordenadas
+        self._pendentes = None   # alterações feitas durante uma reconstrução
+        self._em_carga = False   # na carga inicial o vocabulário é ordenado só no fim
+        self.pronto = False
+        self.versoes = None      # versões de TABELAS lidas na última reconstrução
+
+    # ----- manutenção -----
+    def adicionar(self, tipo, id_, **campos):
+        with self._lock:
+            self._aplicar("adicionar", (tipo, id_), campos)
+
+    def remover(self, tipo, id_):
+        with self._lock:
+            self._aplicar("remover", (tipo, id_), None)
+
+    def _aplicar(self, operacao, chave, campos):
+        self._remover(chave)
+        if operacao == "adicionar":
+            self._adicionar(chave, campos)
+        if self._pendentes is not None:
+            self._pendentes.append((operacao, chave, campos))
+
+    def _adicionar(self, chave, campos):
+        tipo, id_ = chave
+        exibicao = {
+            "tipo": tipo,
+            "id": id_,
+            "nome": campos.get("nome"),
+            "detalhe": campos.get("email") or campos.get("descricao"),
+        }
+        palavras_nome = palavras(campos.get("nome"))
+        nome = " ".join(palavras_nome)
+        primeira = palavras_nome[0] if palavras_nome else None
+        termos = {palavra for campo, valor in campos.items() if campo not in CAMPOS_EMAIL for palavra in palavras(valor)}
+        emails = {palavra for campo in CAMPOS_EMAIL for palavra in palavras(campos.get(campo))}
+        codigo = self._codigos[chave] = _codigo(tipo, id_, nome)
+        self._documentos[codigo] = (exibicao, _juntar(termos), _juntar(emails), nome, primeira)
+        self._nomes.setdefault(nome, set()).add(codigo)
+        if primeira is not None:
+            self._iniciais.setdefault(primeira, set()).add(codigo)
+        for palavra in termos:
+            if self._incluir(self._textos, self._vocabulario, palavra, codigo):
+                for trigrama in trigramas(palavra):
+                    self._trigramas.setdefault(trigrama, set()).add(palavra)
+        for palavra in emails:
+            self._incluir(self._emails, self._vocabulario_email, palavra, codigo)
+
+    def _incluir(self, postings, vocabulario, palavra, codigo):
+        # Devolve True se a palavra é nova no vocabulário
+        documentos = postings.get(palavra)
+        nova = documentos is None
+        if nova:
+            documentos = postings[palavra] = set()
+            if self._em_carga:
+                vocabulario.append(palavra)
+            else:
+                insort(vocabulario, palavra)
+        documentos.add(codigo)
+        return nova
+
+    def _remover(self, chave):
+        codigo = self._codigos.pop(chave, None)
+        if codigo is None:
+            return
+        _, termos, emails, nome, primeira = self._documentos.pop(codigo)
+        termos, emails = termos.split("\0")[1:], emails.split("\0")[1:]
+        _descartar(self._nomes, nome, codigo)
+        if primeira is not None:
+            _descartar(self._iniciais, primeira, codigo)
+        for palavra in termos:
+            if not self._excluir(self._textos, self._vocabulario, palavra, codigo):
+                for trigrama in trigramas(palavra):
+                    _descartar(self._trigramas, trigrama, palavra)
+        for palavra in emails:
+            self._excluir(self._emails, self._vocabulario_email, palavra, codigo)
+
+    def _excluir(self, postings, vocabulario, palavra, codigo):
+        # Devolve False se a palavra saiu do vocabulário
+        if _descartar(postings, palavra, codigo):
+            return True
+        del vocabulario[bisect_left(vocabulario, palavra)]
+        return False
+
+    # ----- consulta -----
+    def _com_prefixo(self, vocabulario, termo, limite=None):
+        inicio = bisect_left(vocabulario, termo)
+        fim = bisect_left(vocabulario, termo + "\U0010ffff", inicio)
+        if limite is not None:
+            fim = min(fim, inicio + limite)
+        return vocabulario[inicio:fim]
+
+    def _expandir(self, termo):
+        # Palavras que o termo alcança: de nome/descrição por prefixo e (3+
+        # letras) por trecho, via trigramas; de e-mail só por prefixo, até
+        # MAX_EXPANSAO. Devolve (palavras de texto, as que batem por prefixo,
+        # palavras de e-mail, se a lista de e-mail está completa).
+        prefixadas = self._com_prefixo(self._vocabulario, termo)
+        textuais = prefixadas
+        if len(termo) >= 3:
+            conjuntos = [self._trigramas.get(trigrama) for trigrama in trigramas(termo)]
+            if all(conjuntos):
+                trecho = [palavra for palavra in set.intersection(*sorted(conjuntos, key=len))
+                          if termo in palavra and not palavra.startswith(termo)]
+                textuais = prefixadas + trecho
+        emails = self._com_prefixo(self._vocabulario_email, termo, MAX_EXPANSAO + 1)
+        return textuais, prefixadas, emails[:MAX_EXPANSAO], len(emails) <= MAX_EXPANSAO
+
+    def _uniao(self, indice, chaves, dentro=None):
+        # Com `dentro`, cada conjunto é cruzado com ele antes da união: custa
+        # o menor dos dois, não o tamanho das postings. Um conjunto só volta
+        # sem cópia (os resultados nunca são alterados no lugar).
+        conjuntos = [indice[chave] for chave in chaves if chave in indice]
+        if dentro is not None:
+            conjuntos = [dentro & conjunto for conjunto in conjuntos]
+        if len(conjuntos) == 1:
+            return conjuntos[0]
+        return set().union(*conjuntos)
+
+    def _filtrar(self, termos):
+        # Todos os termos precisam aparecer como prefixo (ou, com 3 letras ou
+        # mais, como trecho de nome/descrição) de alguma palavra do documento.
+        # Devolve os candidatos e, entre eles, os que batem só por prefixo.
+        planos = []
+        for termo in set(termos):
+            textuais, prefixadas, emails, completa = self._expandir(termo)
+            estimativa = (sum(len(self._textos[p]) for p in textuais)
+                          + sum(len(self._emails[p]) for p in emails))
+            planos.append((not completa, estimativa, termo, textuais, prefixadas, emails))
+        planos.sort(key=lambda plano: plano[:2])
+        candidatos = por_prefixo = None
+        for incompleta, estimativa, termo, textuais, prefixadas, emails in planos:
+            if candidatos is not None and (incompleta or estimativa > FATOR_FILTRO * len(candidatos)):
+                documentos, inicio = self._documentos, "\0" + termo
+                com_prefixo = {c for c in candidatos if inicio in documentos[c][1] or inicio in documentos[c][2]}
+                if len(termo) >= 3:
+                    candidatos = com_prefixo | {c for c in candidatos - com_prefixo if termo in documentos[c][1]}
+                else:
+                    candidatos = com_prefixo
+                por_prefixo = por_prefixo & com_prefixo
+            else:
+                de_email = self._uniao(self._emails, emails, candidatos)
+                documentos = _unir(self._uniao(self._textos, textuais, candidatos), de_email)
+                if len(prefixadas) == len(textuais):
+                    com_prefixo = documentos
+                else:
+                    com_prefixo = _unir(self._uniao(self._textos, prefixadas, candidatos), de_email)
+                candidatos = documentos
+                por_prefixo = com_prefixo if por_prefixo is None else por_prefixo & com_prefixo
+            if not candidatos:
+                return set(), set()
+        return candidatos, por_prefixo
+
+    def buscar(self, consulta, tipo=None, skip=0, limit=20):
+        # A ordenação é por faixas calculadas com operações de conjunto; só a
+        # faixa que completa a página é ordenada item a item.
+        termos = palavras(consulta)
+        if not termos:
+            return 0, []
+        with self._lock:
+            candidatos, por_prefixo = self._filtrar(termos)
+            if tipo and candidatos:
+                codigo_tipo = _CODIGOS_TIPO[tipo]
+                candidatos = {c for c in candidatos if (c >> _BITS_ID) & ((1 << _BITS_TIPO) - 1) == codigo_tipo}
+                por_prefixo = por_prefixo & candidatos
+            exatos = self._nomes.get(" ".join(termos), set()) & candidatos
+            inicio = self._uniao(self._iniciais, self._com_prefixo(self._vocabulario, termos[0])) & por_prefixo
+            # Cada faixa só é calculada se a página ainda não fechou
+            faixas = [
+                (PONTUACOES["exato"], lambda: exatos),
+                (PONTUACOES["inicio"], lambda: inicio - exatos),
+                (PONTUACOES["prefixo"], lambda: por_prefixo - inicio),
+                (PONTUACOES["trecho"], lambda: candidatos - por_prefixo),
+            ]
+            faltam = skip + limit
+            selecionados = []
+            for pontuacao, calcular in faixas:
+                if faltam <= 0:
+                    break
+                faixa = calcular()
+                ordenados = heapq.nsmallest(faltam, faixa) if len(faixa) > faltam else sorted(faixa)
+                selecionados.extend((pontuacao, codigo) for codigo in ordenados)
+                faltam -= len(ordenados)
+            itens = [dict(self._documentos[codigo][0], pontuacao=pontuacao) for pontuacao, codigo in selecionados[skip:]]
+        return len(candidatos), itens
+
+    # ----- reconstrução -----
+    def reconstruir(self, sessao):
+        # Monta um índice novo fora do lock (as buscas continuam sendo
+        # atendidas pelo antigo) e troca no fim, reaplicando as alterações
+        # que chegaram enquanto isso.
+        with self._lock:
+            self._pendentes = []
+        try:
+            # Antes das linhas: escrita gravada durante a carga deixa o
+            # índice com versão antiga e a próxima checagem reconstrói
+            lidas = versoes.obter_sync(sessao, TABELAS)
+            novo = IndiceBusca()
+            novo._em_carga = True
+            for tipo, (modelo, coluna_id, campos) in TIPOS.items():
+                colunas = [getattr(modelo, coluna_id)] + [getattr(modelo, campo) for campo in campos]
+                for linha in sessao.execute(select(*colunas).execution_options(yield_per=10_000)):
+                    novo._adicionar((tipo, linha[0]), dict(zip(campos, linha[1:])))
+            novo._vocabulario.sort()
+            novo._vocabulario_email.sort()
+        except Exception:
+            with self._lock:
+                self._pendentes = None
+            raise
+        with self._lock:
+            pendentes, self._pendentes = self._pendentes, None
+            self._codigos, self._documentos = novo._codigos, novo._documentos
+            self._textos, self._emails = novo._textos, novo._emails
+            self._iniciais, self._nomes = novo._iniciais, novo._nomes
+            self._trigramas, self._vocabulario = novo._trigramas, novo._vocabulario
+            self._vocabulario_email = novo._vocabulario_email
+            for operacao, chave, campos in pendentes:
+                self._aplicar(operacao, chave, campos)
+            self.pronto = True
+            self.versoes = lidas
+
+    def sincronizar(self, sessao):
+        # Reconstrói se alguma tabela mudou desde a última carga (sem carga
+        # inicial, BUSCA_RECONSTRUIR=0, o índice segue só com as escritas)
+        if not self.pronto or versoes.obter_sync(sessao, TABELAS) == self.versoes:
+            return False
+        self.reconstruir(sessao)
+        return True
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "pronto": self.pronto,
+                "documentos": len(self._documentos),
+                "palavras": len(self._textos),
+                "palavras_email": len(self._emails),
+                "trigramas": len(self._trigramas),
+            }
+
+
+def _unir(a, b):
+    return a | b if b else a
+
+
+def _juntar(palavras_documento):
+    return "".join("\0" + palavra for palavra in palavras_documento)
+
+
+indice = IndiceBusca()
+
+
+def indexar(tipo, objeto):
+    _, coluna_id, campos = TIPOS[tipo]
+    indice.adicionar(tipo, getattr(objeto, coluna_id), **{campo: getattr(objeto, campo) for campo in campos})
+
+
+def indexar_importados(sessao, modelo, linhas):
+    # Gancho da importação: o insert em lote não devolve os ids, então
+    # busca as linhas recém-gravadas pelo e-mail (uma consulta por lote)
+    for tipo, (modelo_tipo, coluna_id, campos) in TIPOS.items():
+        if modelo_tipo is not modelo:
+            continue
+        emails = [dados["email"] for dados in linhas]
+        colunas = [getattr(modelo, coluna_id)] + [getattr(modelo, campo) for campo in campos]
+        for linha in sessao.execute(select(*colunas).where(modelo.email.in_(emails))):
+            indice.adicionar(tipo, linha[0], **dict(zip(campos, linha[1:])))
+
+
+def _reconstruir_em_thread():
+    sessao = SessionLocal()
+    try:
+        indice.reconstruir(sessao)
+    finally:
+        sessao.close()
+
+
+def _sincronizar_em_thread():
+    sessao = SessionLocal()
+    try:
+        return indice.sincronizar(sessao)
+    finally:
+        sessao.close()
+
+
+async def reconstruir():
+    # Montar o índice é trabalho de CPU: roda no threadpool com sessão própria
+    await run_in_threadpool(_reconstruir_em_thread)
+    estatisticas = indice.estatisticas()
+    logger.info("Índice de busca reconstruído: %d documentos, %d palavras",
+                estatisticas["documentos"], estatisticas["palavras"])
+    return estatisticas
+
+
+async def sincronizar_periodicamente(intervalo=BUSCA_INTERVALO_RECONSTRUCAO):
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            if await run_in_threadpool(_sincronizar_em_thread):
+                logger.info("Índice de busca reconstruído após escritas: %d documentos",
+                            indice.estatisticas()["documentos"])
+        except Exception:
+            logger.exception("Falha ao reconstruir o índice de busca")
+
+
+async def manter(inicial=BUSCA_RECONSTRUIR, intervalo=BUSCA_INTERVALO_RECONSTRUCAO):
+    # Tarefa de fundo da aplicação: a carga inicial não segura a
+    # inicialização; depois, a checagem periódica de versões (se configurada)
+    if inicial:
+        try:
+            await reconstruir()
+        except Exception:
+            logger.exception("Falha ao montar o índice de busca")
+    if intervalo:
+        await sincronizar_periodicamente(intervalo)
+
+
+def disponivel():
+    # Sem a carga inicial o índice começa vazio e é alimentado pelas escritas
+    return indice.pronto or not BUSCA_RECONSTRUIR
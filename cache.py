@@ -0,0 +1,211 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+import schemas
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # backend compartilhado é opcional
+    redis_asyncio = None
+
+# Cache de leitura (read-through) para buscas de um único recurso.
+# Nível 1: LRU em memória com TTL, por processo. Nível 2 (opcional): backend
+# compartilhado entre workers (Redis, ou o BackendLocal como substituto).
+# Os valores guardados são os payloads já serializados (dicts), nunca objetos ORM.
+#
+# Invalidação de um namespace inteiro (ex.: todas as turmas quando um
+# professor muda) é feita trocando a "geração" do namespace, que faz parte
+# da chave: as entradas antigas deixam de ser alcançáveis e expiram sozinhas.
+#
+# Cada entrada guarda também a versão das tabelas de onde veio (o ETag de
+# versoes.py). Uma leitura com outra versão descarta a entrada: a cópia L1
+# de um worker não sobrevive a escritas feitas em outro, e um preenchimento
+# que começou antes de uma invalidação fica preso à versão antiga.
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "60"))
+CACHE_MAX_ITENS = int(os.getenv("CACHE_MAX_ITENS", "10000"))
+# "" (só memória), "local" (substituto em processo) ou uma URL redis://
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "")
+
+
+class CacheLRU:
+    # Usado só a partir do event loop, então não precisa de lock
+    def __init__(self, max_itens=CACHE_MAX_ITENS, ttl=CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self.evictions = 0
+        self.expirados = 0
+
+    def get(self, chave):
+        item = self._itens.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em < time.monotonic():
+            del self._itens[chave]
+            self.expirados += 1
+            return None
+        self._itens.move_to_end(chave)
+        return valor
+
+    def set(self, chave, valor):
+        self._itens[chave] = (time.monotonic() + self.ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, chave):
+        self._itens.pop(chave, None)
+
+    def clear(self):
+        self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class BackendLocal:
+    # Substituto em processo para o backend compartilhado (testes e dev local)
+    def __init__(self):
+        self._dados = {}
+
+    async def get(self, chave):
+        item = self._dados.get(chave)
+        if item is None:
+            return None
+        expira_em, valor = item
+        if expira_em is not None and expira_em < time.monotonic():
+            del self._dados[chave]
+            return None
+        return valor
+
+    async def set(self, chave, valor, ttl=None):
+        self._dados[chave] = (time.monotonic() + ttl if ttl else None, valor)
+
+    async def delete(self, chave):
+        self._dados.pop(chave, None)
+
+    async def incr(self, chave):
+        _, valor = self._dados.get(chave, (None, "0"))
+        novo = int(valor) + 1
+        self._dados[chave] = (None, str(novo))
+        return novo
+
+
+class BackendRedis:
+    def __init__(self, url):
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND aponta para Redis, mas o pacote 'redis' não está instalado")
+        self._cliente = redis_asyncio.from_url(url, decode_responses=True)
+
+    async def get(self, chave):
+        return await self._cliente.get(chave)
+
+    async def set(self, chave, valor, ttl=None):
+        await self._cliente.set(chave, valor, ex=int(ttl) if ttl else None)
+
+    async def delete(self, chave):
+        await self._cliente.delete(chave)
+
+    async def incr(self, chave):
+        return await self._cliente.incr(chave)
+
+
+def criar_backend(config=CACHE_BACKEND):
+    if not config:
+        return None
+    if config == "local":
+        return BackendLocal()
+    return BackendRedis(config)
+
+
+class CacheEntidades:
+    def __init__(self, local=None, compartilhado=None, ttl=CACHE_TTL):
+        self.local = local or CacheLRU(ttl=ttl)
+        self.compartilhado = compartilhado
+        self.ttl = ttl
+        self._geracoes = {}
+        self.hits = 0
+        self.hits_compartilhado = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self.descartados = 0  # entradas de outra versão das tabelas
+
+    async def _geracao(self, namespace):
+        if self.compartilhado is not None:
+            geracao = await self.compartilhado.get(f"geracao:{namespace}")
+            self._geracoes[namespace] = int(geracao or 0)
+        return self._geracoes.get(namespace, 0)
+
+    async def _chave(self, namespace, id_):
+        return f"{namespace}:{await self._geracao(namespace)}:{id_}"
+
+    async def obter(self, namespace, id_, versao=None):
+        chave = await self._chave(namespace, id_)
+        item = self.local.get(chave)
+        if item is not None:
+            if item[0] == versao:
+                self.hits += 1
+                return item[1]
+            self.local.delete(chave)
+            self.descartados += 1
+        if self.compartilhado is not None:
+            bruto = await self.compartilhado.get(chave)
+            if bruto is not None:
+                item = json.loads(bruto)
+                if item["versao"] == versao:
+                    self.local.set(chave, (versao, item["valor"]))
+                    self.hits_compartilhado += 1
+                    return item["valor"]
+                self.descartados += 1
+        self.misses += 1
+        return None
+
+    async def guardar(self, namespace, id_, valor, versao=None):
+        chave = await self._chave(namespace, id_)
+        self.local.set(chave, (versao, valor))
+        if self.compartilhado is not None:
+            bruto = json.dumps({"versao": versao, "valor": valor}, default=str)
+            await self.compartilhado.set(chave, bruto, self.ttl)
+
+    async def guardar_objeto(self, namespace, id_, schema, objeto, versao=None):
+        # Serializa o objeto ORM pelo schema de resposta e guarda o dict
+        valor = schemas.serializar(schema, objeto)
+        await self.guardar(namespace, id_, valor, versao)
+        return valor
+
+    async def invalidar(self, namespace, id_):
+        chave = await self._chave(namespace, id_)
+        self.invalidacoes += 1
+        self.local.delete(chave)
+        if self.compartilhado is not None:
+            await self.compartilhado.delete(chave)
+
+    async def invalidar_namespace(self, namespace):
+        self.invalidacoes += 1
+        if self.compartilhado is not None:
+            self._geracoes[namespace] = await self.compartilhado.incr(f"geracao:{namespace}")
+        else:
+            self._geracoes[namespace] = self._geracoes.get(namespace, 0) + 1
+
+    def estatisticas(self):
+        return {
+            "hits": self.hits,
+            "hits_compartilhado": self.hits_compartilhado,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "expirados": self.local.expirados,
+            "invalidacoes": self.invalidacoes,
+            "descartados": self.descartados,
+            "itens": len(self.local),
+            "max_itens": self.local.max_itens,
+            "ttl": self.ttl,
+            "backend_compartilhado": type(self.compartilhado).__name__ if self.compartilhado else None,
+        }
+
+
+cache = CacheEntidades(compartilhado=criar_backend())
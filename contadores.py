@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import func, select
+
+import models
+from database import sessao_async
+
+# Contadores do painel (/home) mantidos em memória. São carregados do banco
+# na inicialização, ajustados pelos handlers de criação/remoção e
+# reconciliados periodicamente para corrigir qualquer desvio (por exemplo,
+# escritas feitas por outro worker ou direto no banco).
+
+logger = logging.getLogger(__name__)
+
+INTERVALO_RECONCILIACAO = 300  # segundos
+
+MODELOS = {
+    "alunos": models.Aluno,
+    "professores": models.Professor,
+    "cursos": models.Curso,
+    "turmas": models.Turma,
+}
+
+
+class Contadores:
+    def __init__(self):
+        self._valores = {nome: 0 for nome in MODELOS}
+        self._lock = threading.Lock()
+
+    def ajustar(self, nome, delta):
+        with self._lock:
+            self._valores[nome] += delta
+
+    def valores(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def carregar(self, db):
+        totais = {nome: db.execute(select(func.count()).select_from(modelo)).scalar_one()
+                  for nome, modelo in MODELOS.items()}
+        with self._lock:
+            desvios = {nome: totais[nome] - self._valores[nome] for nome in totais if totais[nome] != self._valores[nome]}
+            self._valores.update(totais)
+        return desvios
+
+
+contadores = Contadores()
+
+
+async def reconciliar():
+    async with sessao_async() as db:
+        desvios = await db.run_sync(contadores.carregar)
+    if desvios:
+        logger.info("Contadores do painel corrigidos: %s", desvios)
+
+
+async def reconciliar_periodicamente(intervalo=INTERVALO_RECONCILIACAO):
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await reconciliar()
+        except Exception:
+            logger.exception("Falha ao reconciliar contadores do painel")
@@ -0,0 +1,280 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+from pathlib import Path, PurePosixPath
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # variantes .br são opcionais
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # sem Pillow as imagens são só copiadas
+    Image = None
+
+# Pipeline de arquivos estáticos. `python -m estaticos` gera static/dist/ com:
+#   - imagens redimensionadas e recodificadas (WebP ou o formato original
+#     otimizado, o que ficar menor);
+#   - CSS com as url(...) apontando para os nomes finais;
+#   - nomes com hash do conteúdo (style.3f2a1b4c5d.css), que nunca mudam de
+#     conteúdo e por isso podem ser cacheados para sempre;
+#   - variantes .gz e .br dos arquivos de texto;
+#   - manifest.json com o nome lógico -> nome final.
+# static/dist/ é uma pasta comum, com as variantes .br/.gz ao lado de cada
+# arquivo: um proxy na frente (nginx com gzip_static/brotli_static e
+# sendfile) pode servi-la direto. Sem proxy, ArquivosEstaticos faz o mesmo.
+# Os templates usam url_estatico("css/style.css"), que consulta o manifesto
+# e cai no arquivo original quando o build não foi feito.
+
+RAIZ = Path(__file__).resolve().parent
+ORIGEM = RAIZ / "static"
+DESTINO = ORIGEM / "dist"
+PREFIXO_URL = "/static"
+MANIFESTO = "manifest.json"
+
+LARGURA_MAX = int(os.getenv("ESTATICOS_LARGURA_MAX", "1920"))
+QUALIDADE = int(os.getenv("ESTATICOS_QUALIDADE", "80"))
+
+IMAGENS = {".png", ".jpg", ".jpeg", ".webp"}
+COMPRIMIVEIS = {".css", ".js", ".svg", ".html", ".json", ".txt"}
+TAMANHO_MIN_COMPRESSAO = 512  # bytes; abaixo disso não compensa
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+
+_URL_CSS = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+# ----------------- BUILD -----------------
+def _com_hash(logico, conteudo, sufixo=None):
+    caminho = PurePosixPath(logico)
+    digest = hashlib.sha256(conteudo).hexdigest()[:10]
+    return str(caminho.with_name(f"{caminho.stem}.{digest}{sufixo or caminho.suffix}"))
+
+
+def _otimizar_imagem(arquivo, conteudo):
+    # Devolve (sufixo, bytes) da menor versão entre a original, a original
+    # recodificada e a WebP, já limitada a LARGURA_MAX
+    candidatos = [(arquivo.suffix, conteudo)]
+    if Image is None:
+        return candidatos[0]
+    with Image.open(io.BytesIO(conteudo)) as imagem:
+        formato = imagem.format
+        if imagem.width > LARGURA_MAX:
+            altura = round(imagem.height * LARGURA_MAX / imagem.width)
+            imagem = imagem.resize((LARGURA_MAX, altura), Image.LANCZOS)
+            candidatos = []  # a original não serve mais
+        else:
+            imagem.load()
+        saida = io.BytesIO()
+        if formato == "JPEG":
+            imagem.convert("RGB").save(saida, "JPEG", quality=QUALIDADE, optimize=True, progressive=True)
+        elif formato == "PNG":
+            imagem.save(saida, "PNG", optimize=True)
+        if saida.tell():
+            candidatos.append((arquivo.suffix, saida.getvalue()))
+        saida = io.BytesIO()
+        imagem.save(saida, "WEBP", quality=QUALIDADE, method=6)
+        candidatos.append((".webp", saida.getvalue()))
+    return min(candidatos, key=lambda candidato: len(candidato[1]))
+
+
+def _reescrever_css(logico, texto, manifesto):
+    pasta = PurePosixPath(logico).parent
+
+    def trocar(encontrado):
+        aspas, url = encontrado.groups()
+        if url.startswith(PREFIXO_URL + "/"):
+            alvo = url[len(PREFIXO_URL) + 1:]
+        elif "://" in url or url.startswith(("data:", "/", "#")):
+            return encontrado.group(0)
+        else:
+            alvo = os.path.normpath(str(pasta / url)).replace(os.sep, "/")
+        final = manifesto.get(alvo)
+        if final is None:
+            return encontrado.group(0)
+        return f"url({aspas}{PREFIXO_URL}/dist/{final}{aspas})"
+
+    return _URL_CSS.sub(trocar, texto)
+
+
+def _comprimir(destino, conteudo):
+    gerados = []
+    comprimido = gzip.compress(conteudo, compresslevel=9, mtime=0)
+    if len(comprimido) < len(conteudo):
+        destino.with_name(destino.name + ".gz").write_bytes(comprimido)
+        gerados.append("gz")
+    if brotli is not None:
+        comprimido = brotli.compress(conteudo, quality=11)
+        if len(comprimido) < len(conteudo):
+            destino.with_name(destino.name + ".br").write_bytes(comprimido)
+            gerados.append("br")
+    return gerados
+
+
+def construir(origem=ORIGEM, destino=DESTINO):
+    origem, destino = Path(origem), Path(destino)
+    if destino.exists():
+        shutil.rmtree(destino)
+    arquivos = sorted(
+        arquivo for arquivo in origem.rglob("*")
+        if arquivo.is_file() and destino not in arquivo.parents
+    )
+    # CSS por último: as url() dele precisam dos nomes finais das imagens
+    arquivos.sort(key=lambda arquivo: arquivo.suffix == ".css")
+
+    manifesto = {}
+    relatorio = []
+    for arquivo in arquivos:
+        logico = arquivo.relative_to(origem).as_posix()
+        conteudo = arquivo.read_bytes()
+        tamanho_original = len(conteudo)
+        sufixo = None
+        if arquivo.suffix.lower() in IMAGENS:
+            sufixo, conteudo = _otimizar_imagem(arquivo, conteudo)
+        elif arquivo.suffix == ".css":
+            conteudo = _reescrever_css(logico, conteudo.decode("utf-8"), manifesto).encode("utf-8")
+        final = _com_hash(logico, conteudo, sufixo)
+        alvo = destino / final
+        alvo.parent.mkdir(parents=True, exist_ok=True)
+        alvo.write_bytes(conteudo)
+        variantes = []
+        if arquivo.suffix.lower() in COMPRIMIVEIS and len(conteudo) >= TAMANHO_MIN_COMPRESSAO:
+            variantes = _comprimir(alvo, conteudo)
+        manifesto[logico] = final
+        relatorio.append((logico, final, tamanho_original, len(conteudo), variantes))
+
+    (destino / MANIFESTO).write_text(json.dumps(manifesto, indent=2, sort_keys=True))
+    return relatorio
+
+
+# ----------------- TEMPLATES -----------------
+_manifesto = None
+
+
+def carregar_manifesto(destino=DESTINO):
+    global _manifesto
+    try:
+        _manifesto = json.loads((Path(destino) / MANIFESTO).read_text())
+    except FileNotFoundError:
+        _manifesto = {}
+    return _manifesto
+
+
+def url_estatico(logico):
+    # Global do Jinja: {{ url_estatico('css/style.css') }}
+    manifesto = _manifesto if _manifesto is not None else carregar_manifesto()
+    final = manifesto.get(logico)
+    if final is None:
+        return f"{PREFIXO_URL}/{logico}"
+    return f"{PREFIXO_URL}/dist/{final}"
+
+
+# ----------------- SERVIDOR -----------------
+def _pesos_codificacao(cabecalho):
+    # Accept-Encoding -> {codificação: q}; q ausente vale 1, inválido vale 0
+    pesos = {}
+    for item in cabecalho.split(","):
+        codificacao, *parametros = (parte.strip() for parte in item.split(";"))
+        if not codificacao:
+            continue
+        peso = 1.0
+        for parametro in parametros:
+            nome, _, valor = parametro.partition("=")
+            if nome.strip().lower() == "q":
+                try:
+                    peso = float(valor)
+                except ValueError:
+                    peso = 0.0
+        pesos[codificacao.lower()] = peso
+    return pesos
+
+
+def _peso(pesos, codificacao):
+    # Codificação não listada: vale o "*"; sem ele, identity continua aceita,
+    # mas abaixo de qualquer codificação listada
+    if codificacao in pesos:
+        return pesos[codificacao]
+    if "*" in pesos:
+        return pesos["*"]
+    return 0.001 if codificacao == "identity" else 0.0
+
+
+class ArquivosEstaticos(StaticFiles):
+    # Arquivos de dist/ têm hash no nome: cache imutável e, se o cliente
+    # aceitar, a variante .br/.gz gerada no build. Os demais são revalidados
+    # a cada uso (ETag/Last-Modified).
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._variantes = {}
+        self._dist = Path(self.directory, "dist").resolve() if self.directory is not None else None
+
+    def _variantes_de(self, caminho):
+        variantes = self._variantes.get(caminho)
+        if variantes is None:
+            variantes = {}
+            for codificacao, extensao in (("br", ".br"), ("gzip", ".gz")):
+                try:
+                    variantes[codificacao] = (caminho + extensao, os.stat(caminho + extensao))
+                except FileNotFoundError:
+                    pass
+            self._variantes[caminho] = variantes  # dist/ não muda depois do build
+        return variantes
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        full_path = str(full_path)
+        imutavel = self._dist is not None and Path(full_path).resolve().is_relative_to(self._dist)
+        cabecalhos = Headers(scope=scope)
+        headers = {"Cache-Control": CACHE_IMUTAVEL if imutavel else "no-cache"}
+        caminho, estatistica = full_path, stat_result
+        if imutavel:
+            variantes = self._variantes_de(full_path)
+            pesos = _pesos_codificacao(cabecalhos.get("accept-encoding", ""))
+            if variantes:
+                headers["Vary"] = "Accept-Encoding"
+            # Maior q entre as variantes e o original; no empate, br > gzip > identity.
+            # q=0 exclui (inclusive identity;q=0 e *;q=0)
+            peso, codificacao = max(
+                ((_peso(pesos, codificacao), codificacao) for codificacao in ("br", "gzip", "identity")
+                 if codificacao == "identity" or codificacao in variantes),
+                key=lambda opcao: opcao[0],
+            )
+            if peso <= 0:
+                return Response(status_code=406, headers=headers)
+            if codificacao != "identity":
+                caminho, estatistica = variantes[codificacao]
+                headers["Content-Encoding"] = codificacao
+        response = FileResponse(
+            caminho, status_code=status_code, headers=headers, stat_result=estatistica,
+            media_type=mimetypes.guess_type(full_path)[0] or "text/plain"
+        )
+        if self.is_not_modified(response.headers, cabecalhos):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m estaticos", description="Build dos arquivos estáticos do Youth Space.")
+    parser.add_argument("--origem", default=str(ORIGEM))
+    parser.add_argument("--destino", default=str(DESTINO))
+    args = parser.parse_args()
+    if Image is None:
+        print("Pillow não instalado: imagens copiadas sem otimização")
+    if brotli is None:
+        print("brotli não instalado: só variantes .gz")
+    for logico, final, antes, depois, variantes in construir(args.origem, args.destino):
+        extras = f" (+{', '.join(variantes)})" if variantes else ""
+        print(f"{logico:32s} -> {final:40s} {antes:>10d} -> {depois:>10d} bytes{extras}")
+
+
+if __name__ == "__main__":
+    main()
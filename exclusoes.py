@@ -0,0 +1,75 @@
+from sqlalchemy import delete, func, select
+
+import models
+import resumos
+
+# Remoção em conjunto de alunos, turmas e cursos com as dependentes
+# (matrículas e lista de espera). Em vez de carregar cada filho pelo cascade
+# do ORM e apagá-lo linha a linha, cada tabela recebe um único DELETE ... IN,
+# dos filhos para os pais, então o custo é de poucas instruções qualquer que
+# seja o número de dependentes. Funciona com ou sem ON DELETE CASCADE no banco
+# (tabelas antigas e SQLite sem PRAGMA foreign_keys). As rotas chamam via
+# run_sync; o commit fica com quem chama. Os resumos de matrícula (resumos.py)
+# são descontados na mesma transação.
+
+MAX_IDS_POR_LOTE = 1000
+
+
+def _apagar(db, modelo, condicao):
+    db.execute(delete(modelo).where(condicao).execution_options(synchronize_session=False))
+
+
+def _existentes(db, coluna, ids):
+    return sorted(db.execute(select(coluna).where(coluna.in_(set(ids)))).scalars())
+
+
+def _contar_por_turma(db, modelo, condicao):
+    return dict(db.execute(
+        select(modelo.id_turma, func.count()).where(condicao).group_by(modelo.id_turma)
+    ).all())
+
+
+def _apagar_turmas(db, ids_turmas):
+    if ids_turmas:
+        resumos.remover_turmas(db, ids_turmas)
+        _apagar(db, models.Matricula, models.Matricula.id_turma.in_(ids_turmas))
+        _apagar(db, models.ListaEspera, models.ListaEspera.id_turma.in_(ids_turmas))
+        _apagar(db, models.Turma, models.Turma.id_turma.in_(ids_turmas))
+
+
+def excluir_alunos(db, ids):
+    # Devolve os ids removidos e as turmas que perderam matrículas (vagas abertas)
+    removidos = _existentes(db, models.Aluno.id_aluno, ids)
+    if not removidos:
+        return removidos, []
+    matriculas = _contar_por_turma(db, models.Matricula, models.Matricula.id_aluno.in_(removidos))
+    espera = _contar_por_turma(db, models.ListaEspera, models.ListaEspera.id_aluno.in_(removidos))
+    # Turmas antes das matrículas, como em matriculas.py
+    resumos.travar_turmas(db, matriculas.keys() | espera.keys())
+    _apagar(db, models.Matricula, models.Matricula.id_aluno.in_(removidos))
+    _apagar(db, models.ListaEspera, models.ListaEspera.id_aluno.in_(removidos))
+    _apagar(db, models.Aluno, models.Aluno.id_aluno.in_(removidos))
+    resumos.registrar_matriculas(
+        db, {t: -n for t, n in matriculas.items()}, {t: -n for t, n in espera.items()}
+    )
+    return removidos, sorted(matriculas)
+
+
+def excluir_turmas(db, ids):
+    removidos = _existentes(db, models.Turma.id_turma, ids)
+    _apagar_turmas(db, removidos)
+    return removidos
+
+
+def excluir_cursos(db, ids):
+    # Devolve os cursos removidos e as turmas que foram junto
+    removidos = _existentes(db, models.Curso.id_curso, ids)
+    if not removidos:
+        return removidos, []
+    turmas = sorted(db.execute(
+        select(models.Turma.id_turma).where(models.Turma.id_curso.in_(removidos))
+    ).scalars())
+    _apagar_turmas(db, turmas)
+    _apagar(db, models.ResumoCurso, models.ResumoCurso.id_curso.in_(removidos))
+    _apagar(db, models.Curso, models.Curso.id_curso.in_(removidos))
+    return removidos, turmas
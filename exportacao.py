@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import select
+
+import models
+from database import AsyncSessionLocal, SessionLocal
+
+# Exportação de matrículas em fluxo: lê tuplas de colunas (sem objetos ORM)
+# com cursor do lado do servidor e escreve bloco a bloco, então a memória
+# fica constante não importa quantas linhas existam.
+
+TAMANHO_BLOCO = 1000
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+COLUNAS = [
+    ("id_matricula", models.Matricula.id_matricula),
+    ("id_aluno", models.Aluno.id_aluno),
+    ("aluno_nome", models.Aluno.nome),
+    ("aluno_email", models.Aluno.email),
+    ("aluno_status", models.Aluno.status),
+    ("id_turma", models.Turma.id_turma),
+    ("turma_horario", models.Turma.horario),
+    ("turma_sala", models.Turma.sala),
+    ("turma_status", models.Turma.status),
+    ("carga_horaria", models.Turma.carga_horaria),
+    ("id_curso", models.Curso.id_curso),
+    ("curso_nome", models.Curso.nome),
+    ("id_professor", models.Professor.id_professor),
+    ("professor_nome", models.Professor.nome),
+    ("professor_email", models.Professor.email),
+]
+NOMES = [nome for nome, _ in COLUNAS]
+
+
+def consulta_matriculas(id_aluno=None, id_turma=None):
+    stmt = (
+        select(*[coluna for _, coluna in COLUNAS])
+        .join(models.Aluno, models.Matricula.id_aluno == models.Aluno.id_aluno)
+        .join(models.Turma, models.Matricula.id_turma == models.Turma.id_turma)
+        .join(models.Curso, models.Turma.id_curso == models.Curso.id_curso)
+        .join(models.Professor, models.Turma.id_professor == models.Professor.id_professor)
+        .order_by(models.Matricula.id_matricula)
+    )
+    if id_aluno is not None:
+        stmt = stmt.where(models.Matricula.id_aluno == id_aluno)
+    if id_turma is not None:
+        stmt = stmt.where(models.Matricula.id_turma == id_turma)
+    return stmt
+
+
+def _codificar_ndjson(linhas, cabecalho):
+    return "".join(json.dumps(dict(zip(NOMES, linha)), ensure_ascii=False) + "\n" for linha in linhas)
+
+
+def _codificar_csv(linhas, cabecalho):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if cabecalho:
+        escritor.writerow(NOMES)
+    escritor.writerows(linhas)
+    return buffer.getvalue()
+
+
+CODIFICADORES = {"ndjson": _codificar_ndjson, "csv": _codificar_csv}
+
+
+class Codificador:
+    # Transforma blocos de linhas em bytes (com gzip opcional, incremental)
+    def __init__(self, formato, compactar):
+        self.formato = formato
+        self.codificar = CODIFICADORES[formato]
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compactar else None
+        self.cabecalho = True
+
+    def bloco(self, linhas):
+        dados = self.codificar(linhas, self.cabecalho).encode("utf-8")
+        self.cabecalho = False
+        return self.compressor.compress(dados) if self.compressor else dados
+
+    def final(self):
+        dados = b""
+        if self.cabecalho and self.formato == "csv":
+            dados = self.bloco([])
+        if self.compressor:
+            dados += self.compressor.flush()
+        return dados
+
+
+# Os geradores abrem a própria sessão porque ela precisa durar até o último
+# byte ser enviado, depois que a dependência da rota já terminou.
+
+def exportar_matriculas(formato="ndjson", compactar=False, id_aluno=None, id_turma=None):
+    # Versão síncrona: o StreamingResponse a consome no threadpool
+    codificador = Codificador(formato, compactar)
+    db = SessionLocal()
+    try:
+        resultado = db.execute(
+            consulta_matriculas(id_aluno, id_turma).execution_options(yield_per=TAMANHO_BLOCO)
+        )
+        for linhas in resultado.partitions():
+            dados = codificador.bloco(linhas)
+            if dados:
+                yield dados
+        dados = codificador.final()
+        if dados:
+            yield dados
+    finally:
+        db.close()
+
+
+async def exportar_matriculas_async(formato="ndjson", compactar=False, id_aluno=None, id_turma=None):
+    codificador = Codificador(formato, compactar)
+    async with AsyncSessionLocal() as db:
+        resultado = await db.stream(
+            consulta_matriculas(id_aluno, id_turma).execution_options(yield_per=TAMANHO_BLOCO)
+        )
+        async for linhas in resultado.partitions():
+            dados = codificador.bloco(linhas)
+            if dados:
+                yield dados
+    dados = codificador.final()
+    if dados:
+        yield dados
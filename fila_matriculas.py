@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import func, select
+
+import models
+from database import sessao_async
+from matriculas import LISTA_ESPERA_MAX, gravar_rodada, montar_decisao
+
+# Fila de matrículas para picos de inscrição (muitas requisições para poucas
+# turmas). A decisão sai na hora, a partir de um contador de vagas por turma
+# mantido em memória: sem vaga nem lugar na espera, "lotada" é respondida sem
+# tocar no banco. Os pedidos aceitos ou em espera vão para uma fila única; um
+# escritor em segundo plano agrupa os pedidos pendentes por turma e grava a
+# rodada inteira em uma transação (matriculas.gravar_rodada), recontando as
+# vagas de cada turma com a linha travada (FOR UPDATE no MySQL), de modo que o
+# banco continua sendo a referência mesmo com vários workers. O chamador
+# aguarda só esse commit.
+
+logger = logging.getLogger(__name__)
+
+FILA_LOTE_MAX = int(os.getenv("FILA_LOTE_MAX", "1000"))  # pedidos por rodada do escritor
+FILA_JANELA_MS = float(os.getenv("FILA_JANELA_MS", "2"))  # espera para juntar pedidos
+FILA_TTL_ESTADO = float(os.getenv("FILA_TTL_ESTADO", "5"))  # segundos até recarregar as vagas
+
+
+class EstadoTurma:
+    __slots__ = ("capacidade", "ocupadas", "espera", "reservadas", "reservadas_espera", "carregado_em")
+
+    def __init__(self):
+        self.capacidade = None
+        self.ocupadas = 0
+        self.espera = 0
+        # Pedidos já decididos que ainda não foram gravados
+        self.reservadas = 0
+        self.reservadas_espera = 0
+        self.carregado_em = 0.0
+
+    def atualizar(self, capacidade, ocupadas, espera):
+        self.capacidade = capacidade
+        self.ocupadas = ocupadas
+        self.espera = espera
+        self.carregado_em = time.monotonic()
+
+    def decidir(self):
+        # Roda no loop de eventos, sem await no meio: a contagem é atômica
+        espera = self.espera + self.reservadas_espera
+        if self.capacidade is None or (not espera and self.ocupadas + self.reservadas < self.capacidade):
+            self.reservadas += 1
+            return "aceita"
+        if espera < LISTA_ESPERA_MAX:
+            self.reservadas_espera += 1
+            return "lista_espera"
+        return "lotada"
+
+    def liberar(self, decisao):
+        if decisao == "aceita":
+            self.reservadas -= 1
+        elif decisao == "lista_espera":
+            self.reservadas_espera -= 1
+
+
+def contar_vagas(db, id_turma):
+    capacidade = db.execute(
+        select(models.Turma.capacidade).where(models.Turma.id_turma == id_turma)
+    ).first()
+    if capacidade is None:
+        return None
+    ocupadas = db.execute(
+        select(func.count()).select_from(models.Matricula).where(models.Matricula.id_turma == id_turma)
+    ).scalar_one()
+    espera = db.execute(
+        select(func.count()).select_from(models.ListaEspera).where(models.ListaEspera.id_turma == id_turma)
+    ).scalar_one()
+    return capacidade[0], ocupadas, espera
+
+
+class FilaMatriculas:
+    def __init__(self):
+        self._fila = None
+        self._estados = {}
+        self._carregando = {}
+
+    def iniciar(self):
+        # A fila pertence ao loop do app; criada na inicialização
+        self._fila = asyncio.Queue()
+        self._estados.clear()
+        return asyncio.create_task(self.processar())
+
+    async def _estado(self, id_turma):
+        estado = self._estados.get(id_turma)
+        if estado is not None and time.monotonic() - estado.carregado_em < FILA_TTL_ESTADO:
+            return estado
+        # Uma única carga por turma, mesmo com milhares de pedidos simultâneos
+        carga = self._carregando.get(id_turma)
+        if carga is None:
+            carga = asyncio.ensure_future(self._carregar(id_turma))
+            self._carregando[id_turma] = carga
+            carga.add_done_callback(lambda _: self._carregando.pop(id_turma, None))
+        return await asyncio.shield(carga)
+
+    async def _carregar(self, id_turma):
+        async with sessao_async() as db:
+            vagas = await db.run_sync(contar_vagas, id_turma)
+        if vagas is None:
+            self._estados.pop(id_turma, None)
+            return None
+        # As reservas em andamento são mantidas; só a foto do banco é trocada
+        estado = self._estados.setdefault(id_turma, EstadoTurma())
+        estado.atualizar(*vagas)
+        return estado
+
+    def invalidar(self, id_turma=None):
+        # Força recarregar as vagas no próximo pedido (turma alterada ou
+        # matrículas gravadas por fora da fila)
+        for chave in ([id_turma] if id_turma is not None else list(self._estados)):
+            estado = self._estados.get(chave)
+            if estado is not None:
+                estado.carregado_em = 0.0
+
+    async def matricular(self, id_aluno, id_turma):
+        estado = await self._estado(id_turma)
+        if estado is None:
+            return montar_decisao(id_aluno, id_turma, "turma_nao_encontrada")
+        decisao = estado.decidir()
+        if decisao == "lotada":
+            return montar_decisao(id_aluno, id_turma, "lotada")
+        futuro = asyncio.get_running_loop().create_future()
+        self._fila.put_nowait((id_turma, id_aluno, decisao, futuro))
+        return await futuro
+
+    def liberar(self, id_turma):
+        # Vaga aberta fora da fila: o escritor promove o primeiro da espera
+        self._fila.put_nowait((id_turma, None, None, None))
+
+    async def vagas(self, id_turma):
+        estado = await self._estado(id_turma)
+        if estado is None:
+            return None
+        return {"id_turma": id_turma, "capacidade": estado.capacidade,
+                "ocupadas": estado.ocupadas + estado.reservadas,
+                "espera": estado.espera + estado.reservadas_espera}
+
+    def _proximo_lote(self, primeiro):
+        lote = [primeiro]
+        while len(lote) < FILA_LOTE_MAX and not self._fila.empty():
+            lote.append(self._fila.get_nowait())
+        por_turma = {}
+        for pedido in lote:
+            por_turma.setdefault(pedido[0], []).append(pedido)
+        return por_turma
+
+    def _concluir(self, id_turma, pedidos, resultados, vagas):
+        estado = self._estados.get(id_turma)
+        if estado is not None:
+            for _, _, decisao, _ in pedidos:
+                estado.liberar(decisao)
+            if vagas is not None:
+                estado.atualizar(*vagas)
+            else:
+                estado.carregado_em = 0.0
+        for (_, _, _, futuro), resultado in zip(pedidos, resultados):
+            if futuro is None or futuro.done():
+                continue
+            if isinstance(resultado, Exception):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+    async def processar(self):
+        while True:
+            primeiro = await self._fila.get()
+            if FILA_JANELA_MS:
+                await asyncio.sleep(FILA_JANELA_MS / 1000)
+            por_turma = self._proximo_lote(primeiro)
+            try:
+                async with sessao_async() as db:
+                    gravados = await db.run_sync(
+                        gravar_rodada, {id_turma: [p[1] for p in pedidos] for id_turma, pedidos in por_turma.items()}
+                    )
+            except Exception as exc:
+                logger.exception("Falha ao gravar a fila de matrículas")
+                gravados = {id_turma: ([exc] * len(pedidos), None) for id_turma, pedidos in por_turma.items()}
+            for id_turma, pedidos in por_turma.items():
+                self._concluir(id_turma, pedidos, *gravados[id_turma])
+
+
+fila = FilaMatriculas()
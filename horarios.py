@@ -0,0 +1,274 @@
+import bisect
+import logging
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import select
+
+import models
+
+# Horários de turma como intervalos semanais e detecção de conflito de sala e
+# de professor. O texto livre de Turma.horario passa a ter um formato:
+#     "seg/qua 08:00-10:00; sex 14:00-16:00; seg a qui 18:00-19:00"
+# (dias abreviados ou por extenso, separados por "/", "," ou "e", ou faixas
+# como "seg a sex" e "seg-qua"; horas como 08:00, 8h ou 8h30; blocos
+# separados por ";"). Cada bloco vira um intervalo
+# [início, fim) em minutos desde segunda 00:00, e o texto é gravado na forma
+# canônica.
+#
+# O índice guarda, por sala e por professor, os intervalos ordenados pelo
+# início: a busca de sobreposição é uma bisseção mais a janela de intervalos
+# que começam até `maior duração` antes, em vez de percorrer todas as turmas.
+# Ele acompanha a versão da tabela turmas (versoes.py) e é recarregado quando
+# outro worker grava turmas.
+
+logger = logging.getLogger(__name__)
+
+MAX_ITENS_GRADE = 5000
+
+DIAS = ("seg", "ter", "qua", "qui", "sex", "sab", "dom")
+MINUTOS_DIA = 24 * 60
+# Nomes aceitos (já normalizados, sem "-feira") -> índice do dia
+_NOMES_DIAS = {
+    **{abreviado: indice for indice, abreviado in enumerate(DIAS)},
+    "segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6,
+}
+
+_BLOCO = re.compile(r"^(?P<dias>.+?)\s+(?P<inicio>\d{1,2}(?:[:h]\d{2}|h)?)\s*(?:-|as|a|ate)\s*(?P<fim>\d{1,2}(?:[:h]\d{2}|h)?)$")
+_SEPARADOR_DIAS = re.compile(r"\s*(?:/|,|\se\s)\s*")
+_FEIRA = re.compile(r"[\s-]feira\b")
+_FAIXA_DIAS = re.compile(r"^(?P<de>\w+)\s*(?:-|\s(?:a|ate)\s)\s*(?P<ate>\w+)$")
+
+
+class HorarioInvalido(ValueError):
+    pass
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto.strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _dia(nome):
+    dia = _NOMES_DIAS.get(nome.strip())
+    if dia is None:
+        raise HorarioInvalido(f"Dia da semana inválido: {nome.strip()!r}")
+    return dia
+
+
+def _dias(texto):
+    # "seg/qua", "seg a sex", "segunda-feira a quarta-feira" -> índices
+    dias = []
+    for parte in _SEPARADOR_DIAS.split(_FEIRA.sub("", texto)):
+        faixa = _FAIXA_DIAS.match(parte.strip())
+        if faixa is None:
+            dias.append(_dia(parte))
+            continue
+        de, ate = _dia(faixa["de"]), _dia(faixa["ate"])
+        if ate <= de:
+            raise HorarioInvalido(f"Faixa de dias invertida: {parte.strip()!r}")
+        dias.extend(range(de, ate + 1))
+    return dias
+
+
+def _minutos(texto):
+    horas, _, minutos = texto.rstrip("h").replace("h", ":").partition(":")
+    horas, minutos = int(horas), int(minutos or 0)
+    if horas > 24 or minutos > 59 or (horas == 24 and minutos):
+        raise HorarioInvalido(f"Hora inválida: {texto!r}")
+    return horas * 60 + minutos
+
+
+def interpretar(texto):
+    # Texto -> lista ordenada de (início, fim) em minutos da semana.
+    # Vazio ou None -> [] (turma sem horário definido).
+    if not texto or not texto.strip():
+        return []
+    intervalos = []
+    for bloco in filter(None, (parte.strip() for parte in _normalizar(texto).split(";"))):
+        encontrado = _BLOCO.match(bloco)
+        if encontrado is None:
+            raise HorarioInvalido(f"Bloco de horário inválido: {bloco!r} (use, por exemplo, 'seg/qua 08:00-10:00')")
+        inicio, fim = _minutos(encontrado["inicio"]), _minutos(encontrado["fim"])
+        if fim <= inicio:
+            raise HorarioInvalido(f"Fim antes do início em {bloco!r}")
+        for dia in _dias(encontrado["dias"]):
+            base = dia * MINUTOS_DIA
+            intervalos.append((base + inicio, base + fim))
+    intervalos.sort()
+    for anterior, atual in zip(intervalos, intervalos[1:]):
+        if atual[0] < anterior[1]:
+            raise HorarioInvalido(f"Blocos sobrepostos: {formatar([anterior])} e {formatar([atual])}")
+    return intervalos
+
+
+def _hora(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def formatar(intervalos):
+    return "; ".join(
+        f"{DIAS[inicio // MINUTOS_DIA]} {_hora(inicio % MINUTOS_DIA)}-{_hora(fim - inicio // MINUTOS_DIA * MINUTOS_DIA)}"
+        for inicio, fim in intervalos
+    ) or None
+
+
+def chave_sala(sala):
+    return " ".join(sala.split()).casefold() if sala and sala.strip() else None
+
+
+class Agenda:
+    # Intervalos de um recurso (sala ou professor), ordenados pelo início
+    __slots__ = ("inicios", "itens", "maior")
+
+    def __init__(self):
+        self.inicios = []
+        self.itens = []
+        self.maior = 0
+
+    def adicionar(self, inicio, fim, id_turma):
+        posicao = bisect.bisect_right(self.inicios, inicio)
+        self.inicios.insert(posicao, inicio)
+        self.itens.insert(posicao, (inicio, fim, id_turma))
+        self.maior = max(self.maior, fim - inicio)
+
+    def remover(self, inicio, id_turma):
+        posicao = bisect.bisect_left(self.inicios, inicio)
+        while posicao < len(self.inicios) and self.inicios[posicao] == inicio:
+            if self.itens[posicao][2] == id_turma:
+                del self.inicios[posicao]
+                del self.itens[posicao]
+                return
+            posicao += 1
+
+    def sobrepostos(self, inicio, fim):
+        # Só quem começa antes de `fim` e depois de `inicio - maior` pode
+        # sobrepor; `maior` é a maior duração já vista neste recurso
+        de = bisect.bisect_right(self.inicios, inicio - self.maior)
+        ate = bisect.bisect_left(self.inicios, fim)
+        return [item for item in self.itens[de:ate] if item[1] > inicio]
+
+
+def _recursos(sala, id_professor):
+    recursos = []
+    chave = chave_sala(sala)
+    if chave is not None:
+        recursos.append(("sala", chave))
+    if id_professor is not None:
+        recursos.append(("professor", id_professor))
+    return recursos
+
+
+class IndiceHorarios:
+    def __init__(self):
+        self._agendas = {}
+        self._turmas = {}
+        self._lock = threading.Lock()
+        self.versao = None
+
+    def _adicionar(self, agendas, turmas, id_turma, sala, id_professor, intervalos):
+        recursos = _recursos(sala, id_professor)
+        turmas[id_turma] = (recursos, intervalos)
+        for recurso in recursos:
+            agenda = agendas.get(recurso)
+            if agenda is None:
+                agenda = agendas[recurso] = Agenda()
+            for inicio, fim in intervalos:
+                agenda.adicionar(inicio, fim, id_turma)
+
+    def _remover(self, id_turma):
+        recursos, intervalos = self._turmas.pop(id_turma, ((), ()))
+        for recurso in recursos:
+            agenda = self._agendas[recurso]
+            for inicio, _ in intervalos:
+                agenda.remover(inicio, id_turma)
+
+    def definir(self, id_turma, sala, id_professor, intervalos, versao=None):
+        # Grava (ou troca) os horários de uma turma depois do commit. `versao`
+        # é a versão de turmas gerada por essa escrita
+        with self._lock:
+            self._remover(id_turma)
+            if intervalos:
+                self._adicionar(self._agendas, self._turmas, id_turma, sala, id_professor, intervalos)
+            if versao is not None and self.versao == versao - 1:
+                self.versao = versao
+
+    def remover(self, id_turma):
+        with self._lock:
+            self._remover(id_turma)
+
+    def conflitos(self, sala, id_professor, intervalos, ignorar=()):
+        encontrados = []
+        vistos = set()
+        with self._lock:
+            for recurso in _recursos(sala, id_professor):
+                agenda = self._agendas.get(recurso)
+                if agenda is None:
+                    continue
+                for inicio, fim in intervalos:
+                    for outro_inicio, outro_fim, id_turma in agenda.sobrepostos(inicio, fim):
+                        chave = (recurso[0], id_turma, outro_inicio)
+                        if id_turma in ignorar or chave in vistos:
+                            continue
+                        vistos.add(chave)
+                        encontrados.append({"recurso": recurso[0], "id_turma": id_turma,
+                                            "horario": formatar([(outro_inicio, outro_fim)])})
+        return encontrados
+
+    def carregar(self, sessao, versao):
+        agendas = {}
+        turmas = {}
+        invalidos = 0
+        linhas = sessao.execute(
+            select(models.Turma.id_turma, models.Turma.sala, models.Turma.id_professor, models.Turma.horario)
+            .where(models.Turma.horario.is_not(None))
+        )
+        for id_turma, sala, id_professor, horario in linhas:
+            try:
+                intervalos = interpretar(horario)
+            except HorarioInvalido:
+                invalidos += 1  # texto antigo fora do formato: fica fora do índice
+                continue
+            if intervalos:
+                self._adicionar(agendas, turmas, id_turma, sala, id_professor, intervalos)
+        with self._lock:
+            self._agendas, self._turmas, self.versao = agendas, turmas, versao
+        if invalidos:
+            logger.warning("%d turmas com horário fora do formato ficaram fora do índice de horários", invalidos)
+        return len(turmas)
+
+
+indice = IndiceHorarios()
+
+
+def validar_grade(itens, considerar_existentes=True):
+    # Cada item é conferido contra as turmas existentes (menos as que a grade
+    # remaneja) e contra os itens anteriores da própria grade, num índice
+    # temporário em que o "id" é a posição do item
+    grade = IndiceHorarios()
+    remanejadas = {item.id_turma for item in itens if item.id_turma is not None}
+    resultados = []
+    for posicao, item in enumerate(itens):
+        resultado = {"indice": posicao, "id_turma": item.id_turma, "horario": None, "erro": None, "conflitos": []}
+        resultados.append(resultado)
+        try:
+            intervalos = interpretar(item.horario)
+        except HorarioInvalido as exc:
+            resultado["erro"] = str(exc)
+            continue
+        resultado["horario"] = formatar(intervalos)
+        if considerar_existentes:
+            resultado["conflitos"] += indice.conflitos(item.sala, item.id_professor, intervalos, ignorar=remanejadas)
+        for conflito in grade.conflitos(item.sala, item.id_professor, intervalos):
+            conflito["indice"] = conflito.pop("id_turma")
+            resultado["conflitos"].append(conflito)
+        grade.definir(posicao, item.sala, item.id_professor, intervalos)
+    valida = not any(resultado["erro"] or resultado["conflitos"] for resultado in resultados)
+    return {"valida": valida, "itens": resultados}
+
+
+def sincronizar(sessao, versao):
+    # Recarrega o índice se ele não refletir a versão `versao` de turmas
+    if indice.versao != versao:
+        indice.carregar(sessao, versao)
@@ -0,0 +1,264 @@
+import argparse
+import csv
+import io
+import json
+from itertools import islice
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import busca
+import matriculas
+import models
+import schemas
+import versoes
+from database import SessionLocal
+
+# Importação em lote: o arquivo é lido em fluxo, em lotes de TAMANHO_LOTE
+# linhas. Cada lote faz uma única consulta de duplicados, um INSERT com
+# executemany e um commit; matrículas passam por matriculas.gravar_rodada,
+# que também faz um número fixo de consultas por lote (turmas travadas com um
+# FOR UPDATE, contagens com GROUP BY). Erros de linha são relatados sem
+# abortar a carga: se o lote conflita com uma escrita paralela, é refeito
+# linha a linha para isolar o erro.
+
+TAMANHO_LOTE = 2000
+MAX_ERROS_RELATADOS = 1000
+FORMATOS = ("csv", "ndjson")
+
+
+class Relatorio:
+    def __init__(self):
+        self.total = 0
+        self.inseridos = 0
+        self.em_espera = 0  # matrículas que foram para a lista de espera
+        self.total_erros = 0
+        self.erros = []
+
+    def erro(self, linha, mensagem):
+        self.total_erros += 1
+        if len(self.erros) < MAX_ERROS_RELATADOS:
+            self.erros.append({"linha": linha, "erro": mensagem})
+
+    def dict(self):
+        return {
+            "total": self.total,
+            "inseridos": self.inseridos,
+            "em_espera": self.em_espera,
+            "total_erros": self.total_erros,
+            "erros": self.erros,
+        }
+
+
+def detectar_formato(nome_arquivo, formato=None):
+    if formato:
+        formato = formato.lower()
+    elif nome_arquivo and nome_arquivo.lower().endswith((".ndjson", ".jsonl")):
+        formato = "ndjson"
+    else:
+        formato = "csv"
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato não suportado: {formato}")
+    return formato
+
+
+def ler_registros(arquivo, formato):
+    # Gera (numero_da_linha, dict | None, erro | None) sem carregar o arquivo inteiro
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    if formato == "csv":
+        leitor = csv.DictReader(texto)
+        for registro in leitor:
+            yield leitor.line_num, registro, None
+        return
+    for numero, linha in enumerate(texto, start=1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as exc:
+            yield numero, None, f"JSON inválido: {exc}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, "Cada linha deve ser um objeto JSON"
+            continue
+        yield numero, registro, None
+
+
+def _mensagem_validacao(exc):
+    erro = exc.errors()[0]
+    campo = ".".join(str(parte) for parte in erro["loc"])
+    return f"{campo}: {erro['msg']}"
+
+
+def _validar(registros, schema, relatorio):
+    # Converte cada registro com o schema Pydantic; linhas inválidas viram erro
+    validos = []
+    for linha, registro, erro in registros:
+        relatorio.total += 1
+        if erro:
+            relatorio.erro(linha, erro)
+            continue
+        registro = {chave: valor for chave, valor in registro.items() if valor not in ("", None)}
+        try:
+            validos.append((linha, schema(**registro).dict()))
+        except ValidationError as exc:
+            relatorio.erro(linha, _mensagem_validacao(exc))
+    return validos
+
+
+def _inserir(db: Session, modelo, linhas, relatorio):
+    if not linhas:
+        return []
+    try:
+        db.execute(insert(modelo), [dados for _, dados in linhas])
+        db.commit()
+        relatorio.inseridos += len(linhas)
+        return linhas
+    except IntegrityError:
+        db.rollback()
+    # Algum registro conflitou com outro gravado em paralelo (ou com outra
+    # restrição única): refaz o lote linha a linha para isolar o erro.
+    inseridas = []
+    for linha, dados in linhas:
+        try:
+            db.execute(insert(modelo), [dados])
+            db.commit()
+            relatorio.inseridos += 1
+            inseridas.append((linha, dados))
+        except IntegrityError as exc:
+            db.rollback()
+            relatorio.erro(linha, f"Violação de restrição: {exc.orig}")
+    return inseridas
+
+
+def _filtrar_emails(db: Session, modelo, linhas, relatorio):
+    emails = {dados["email"] for _, dados in linhas}
+    existentes = set(db.execute(select(modelo.email).where(modelo.email.in_(emails))).scalars())
+    vistos = set()
+    novos = []
+    for linha, dados in linhas:
+        if dados["email"] in existentes:
+            relatorio.erro(linha, "E-mail já cadastrado")
+        elif dados["email"] in vistos:
+            relatorio.erro(linha, "E-mail repetido no arquivo")
+        else:
+            vistos.add(dados["email"])
+            novos.append((linha, dados))
+    return novos
+
+
+# Mensagens das decisões de matriculas.gravar_rodada recusadas na importação
+ERROS_MATRICULA = {
+    "aluno_nao_encontrado": "Aluno não encontrado",
+    "turma_nao_encontrada": "Turma não encontrada",
+    "ja_matriculado": "Aluno já matriculado nesta turma (ou repetido no arquivo)",
+    "ja_na_espera": "Aluno já está na lista de espera desta turma",
+    "lotada": "Turma lotada",
+}
+
+
+def _gravar_matriculas(db: Session, linhas, relatorio):
+    # Mesma checagem de vagas da fila: turmas travadas e recontadas; quem
+    # passa da capacidade vai para a lista de espera ou é recusado
+    por_turma = {}
+    for linha, dados in linhas:
+        por_turma.setdefault(dados["id_turma"], []).append((linha, dados))
+    try:
+        gravados = matriculas.gravar_rodada(
+            db, {id_turma: [dados["id_aluno"] for _, dados in itens] for id_turma, itens in por_turma.items()}
+        )
+    except IntegrityError:
+        # Mesmo isolamento de _inserir: só a linha que conflitou vira erro
+        inseridas = []
+        for linha, dados in linhas:
+            try:
+                gravados = matriculas.gravar_rodada(db, {dados["id_turma"]: [dados["id_aluno"]]}, tentativas=1)
+            except IntegrityError as exc:
+                relatorio.erro(linha, f"Violação de restrição: {exc.orig}")
+                continue
+            inseridas += _relatar_matriculas([(linha, dados)], gravados[dados["id_turma"]][0], relatorio)
+        return inseridas
+    inseridas = []
+    for id_turma, itens in por_turma.items():
+        inseridas += _relatar_matriculas(itens, gravados[id_turma][0], relatorio)
+    return inseridas
+
+
+def _relatar_matriculas(itens, decisoes, relatorio):
+    inseridas = []
+    for (linha, dados), item in zip(itens, decisoes):
+        if item["status"] == "aceita":
+            relatorio.inseridos += 1
+            inseridas.append((linha, dados))
+        elif item["status"] == "lista_espera":
+            relatorio.em_espera += 1
+        else:
+            relatorio.erro(linha, ERROS_MATRICULA[item["status"]])
+    return inseridas
+
+
+ENTIDADES = {
+    "alunos": (models.Aluno, schemas.AlunoImportacao, lambda db, linhas, rel: _filtrar_emails(db, models.Aluno, linhas, rel)),
+    "professores": (models.Professor, schemas.ProfessorImportacao, lambda db, linhas, rel: _filtrar_emails(db, models.Professor, linhas, rel)),
+    "matriculas": (models.Matricula, schemas.MatriculaCreate, None),
+}
+# Entidades que não são gravadas com um INSERT direto por lote
+GRAVAR = {
+    "matriculas": _gravar_matriculas,
+}
+
+
+def importar(db: Session, entidade, arquivo, formato="csv", tamanho_lote=TAMANHO_LOTE, ao_inserir=None):
+    # ao_inserir(db, modelo, linhas) é chamado após cada lote gravado
+    if entidade not in ENTIDADES:
+        raise ValueError(f"Entidade não suportada: {entidade}")
+    modelo, schema, filtrar = ENTIDADES[entidade]
+    relatorio = Relatorio()
+    registros = ler_registros(arquivo, formato)
+    while True:
+        lote = list(islice(registros, tamanho_lote))
+        if not lote:
+            break
+        validos = _validar(lote, schema, relatorio)
+        if validos:
+            if entidade in GRAVAR:
+                inseridas = GRAVAR[entidade](db, validos, relatorio)
+            else:
+                inseridas = _inserir(db, modelo, filtrar(db, validos, relatorio), relatorio)
+            if inseridas and ao_inserir is not None:
+                ao_inserir(db, modelo, [dados for _, dados in inseridas])
+    return relatorio
+
+
+def importar_arquivo(entidade, arquivo, formato="csv", tamanho_lote=TAMANHO_LOTE):
+    # Caminho da rota e da linha de comando, com sessão síncrona própria:
+    # indexa os registros na busca e incrementa a versão da tabela, para que
+    # caches e índices dos workers vejam a carga
+    db = SessionLocal()
+    try:
+        relatorio = importar(db, entidade, arquivo, formato, tamanho_lote, busca.indexar_importados)
+        if relatorio.inseridos and entidade in versoes.TABELAS:
+            # Versão incrementada depois dos lotes já gravados
+            versoes.incrementar_sync(db, entidade)
+            db.commit()
+        return relatorio
+    finally:
+        db.close()
+
+
+# ----------------- LINHA DE COMANDO -----------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa alunos, professores ou matrículas de um arquivo CSV/NDJSON.")
+    parser.add_argument("entidade", choices=sorted(ENTIDADES))
+    parser.add_argument("arquivo")
+    parser.add_argument("--formato", choices=FORMATOS)
+    parser.add_argument("--lote", type=int, default=TAMANHO_LOTE)
+    args = parser.parse_args()
+
+    formato = detectar_formato(args.arquivo, args.formato)
+    with open(args.arquivo, "rb") as arquivo:
+        relatorio = importar_arquivo(args.entidade, arquivo, formato, args.lote)
+    print(json.dumps(relatorio.dict(), ensure_ascii=False, indent=2))
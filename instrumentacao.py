@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Instrumentação por rota: número de consultas, tempo no banco, linhas
+# retornadas e tempo de serialização, mais detecção de N+1 (o mesmo SQL
+# repetido com parâmetros diferentes dentro de uma requisição).
+# Os ganchos do SQLAlchemy gravam na estatística da requisição corrente,
+# guardada num ContextVar; o middleware agrega por rota no fim.
+
+logger = logging.getLogger(__name__)
+
+# Mesmo SQL executado mais que isto numa requisição é sinalizado como N+1
+LIMITE_N_MAIS_UM = int(os.getenv("LIMITE_N_MAIS_UM", "5"))
+# Consultas acima deste tempo vão para o log de consultas lentas (0 desliga)
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "0"))
+# Inclui o plano (EXPLAIN) no log de consultas lentas
+SQL_LENTA_EXPLAIN = os.getenv("SQL_LENTA_EXPLAIN", "0") == "1"
+
+_requisicao_atual = ContextVar("requisicao_atual", default=None)
+_explicando = ContextVar("explicando", default=False)
+
+
+class EstatisticaRequisicao:
+    __slots__ = ("consultas", "tempo_db", "linhas", "tempo_endpoint", "tempo_rota", "statements")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.linhas = 0
+        self.tempo_endpoint = 0.0
+        self.tempo_rota = 0.0
+        self.statements = {}
+
+    def suspeitas_n_mais_um(self):
+        # {sql: execuções} dos statements com mais de LIMITE_N_MAIS_UM
+        # conjuntos de parâmetros distintos
+        return {sql: execucoes for sql, (execucoes, parametros) in self.statements.items()
+                if len(parametros) > LIMITE_N_MAIS_UM}
+
+
+class EstatisticaRota:
+    __slots__ = ("requisicoes", "consultas", "tempo_db", "linhas", "tempo_serializacao", "tempo_total", "n_mais_um")
+
+    def __init__(self):
+        self.requisicoes = 0
+        self.consultas = 0
+        self.tempo_db = 0.0
+        self.linhas = 0
+        self.tempo_serializacao = 0.0
+        self.tempo_total = 0.0
+        self.n_mais_um = 0
+
+
+class Metricas:
+    def __init__(self):
+        self.rotas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metodo, rota, requisicao, tempo_total):
+        suspeitas = requisicao.suspeitas_n_mais_um()
+        for sql, execucoes in suspeitas.items():
+            logger.warning("Possível N+1 em %s %s: %d execuções de %s", metodo, rota, execucoes, sql[:200])
+        with self._lock:
+            estatistica = self.rotas.setdefault((metodo, rota), EstatisticaRota())
+            estatistica.requisicoes += 1
+            estatistica.consultas += requisicao.consultas
+            estatistica.tempo_db += requisicao.tempo_db
+            estatistica.linhas += requisicao.linhas
+            # A serialização da resposta acontece dentro do handler da rota,
+            # depois que o endpoint retorna: é a diferença entre os dois tempos.
+            estatistica.tempo_serializacao += max(requisicao.tempo_rota - requisicao.tempo_endpoint, 0.0)
+            estatistica.tempo_total += tempo_total
+            estatistica.n_mais_um += len(suspeitas)
+
+    def instantaneo(self):
+        with self._lock:
+            return {chave: (e.requisicoes, e.consultas, e.tempo_db, e.linhas, e.tempo_serializacao, e.tempo_total, e.n_mais_um)
+                    for chave, e in self.rotas.items()}
+
+    def prometheus(self, extras=None):
+        series = [
+            ("youthspace_requisicoes_total", "counter", "Requisições atendidas por rota", 0),
+            ("youthspace_consultas_sql_total", "counter", "Consultas SQL emitidas por rota", 1),
+            ("youthspace_tempo_db_segundos_total", "counter", "Tempo gasto no banco por rota", 2),
+            ("youthspace_linhas_retornadas_total", "counter", "Entidades carregadas pelo ORM, tuplas do caminho rápido e linhas afetadas por escritas, por rota", 3),
+            ("youthspace_tempo_serializacao_segundos_total", "counter", "Tempo de serialização da resposta por rota", 4),
+            ("youthspace_tempo_requisicao_segundos_total", "counter", "Tempo total de requisição por rota", 5),
+            ("youthspace_n_mais_um_total", "counter", "Padrões N+1 detectados por rota", 6),
+        ]
+        dados = self.instantaneo()
+        linhas = []
+        for nome, tipo, ajuda, indice in series:
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for (metodo, rota), valores in sorted(dados.items()):
+                linhas.append(f'{nome}{{metodo="{metodo}",rota="{_escapar(rota)}"}} {valores[indice]}')
+        for nome, ajuda, valor in extras or []:
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} gauge")
+            linhas.append(f"{nome} {valor}")
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"')
+
+
+metricas = Metricas()
+
+
+class Partida:
+    # Marcos da inicialização do worker, em segundos desde o início do import
+    # de main.py: "import", "startup" e "primeira_resposta"
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.marcos = {}
+
+    def marcar(self, marco):
+        if marco not in self.marcos:
+            self.marcos[marco] = time.perf_counter() - self.inicio
+            logger.info("Partida: %s em %.3fs", marco, self.marcos[marco])
+
+    def metricas(self):
+        return [(f"youthspace_partida_{marco}_segundos", f"Segundos do import de main.py até: {marco}", round(valor, 6))
+                for marco, valor in self.marcos.items()]
+
+
+partida = Partida()
+
+
+# ----------------- GANCHOS DO SQLALCHEMY -----------------
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+    if context is not None:
+        context.consulta_em_andamento = True
+
+
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.consulta_em_andamento = False
+    duracao = time.perf_counter() - conn.info["inicio_consulta"].pop()
+    if _explicando.get():
+        return
+    requisicao = _requisicao_atual.get()
+    if requisicao is not None:
+        requisicao.consultas += 1
+        requisicao.tempo_db += duracao
+        # Para escritas conta as linhas afetadas; SELECTs são contados pelo
+        # evento "load" abaixo, porque nem todo driver informa rowcount neles.
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+            requisicao.linhas += max(cursor.rowcount, 0)
+        # Contador de execuções e só os parâmetros necessários para detectar
+        # o N+1: a memória fica limitada em requisições com milhares de consultas
+        uso = requisicao.statements.setdefault(statement, [0, set()])
+        uso[0] += 1
+        if len(uso[1]) <= LIMITE_N_MAIS_UM:
+            uso[1].add(repr(parameters)[:200])
+    if SQL_LENTA_MS and duracao * 1000 >= SQL_LENTA_MS:
+        _registrar_consulta_lenta(conn, statement, parameters, duracao, executemany)
+
+
+def _erro_ao_executar(contexto):
+    # Consulta que falhou não passa por after_cursor_execute: tira o início
+    # dela da pilha, senão as próximas medições pegam o início errado.
+    # Erros fora da execução (conexão, fetch) não empilharam nada.
+    execucao = contexto.execution_context
+    if contexto.connection is None or not getattr(execucao, "consulta_em_andamento", False):
+        return
+    execucao.consulta_em_andamento = False
+    pilha = contexto.connection.info.get("inicio_consulta")
+    if pilha:
+        pilha.pop()
+
+
+def somar_linhas(quantidade):
+    # Linhas lidas fora do ORM (tuplas do caminho rápido de serializacao.py)
+    requisicao = _requisicao_atual.get()
+    if requisicao is not None:
+        requisicao.linhas += quantidade
+
+
+def _contar_linha_carregada(alvo, contexto):
+    # Cada entidade materializada pelo ORM conta como uma linha lida
+    requisicao = _requisicao_atual.get()
+    if requisicao is not None:
+        requisicao.linhas += 1
+
+
+def _registrar_consulta_lenta(conn, statement, parameters, duracao, executemany):
+    plano = ""
+    if SQL_LENTA_EXPLAIN and not executemany and statement.lstrip().upper().startswith("SELECT"):
+        prefixo = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+        token = _explicando.set(True)
+        try:
+            linhas = conn.exec_driver_sql(prefixo + statement, parameters).fetchall()
+            plano = "\n".join(" | ".join(str(coluna) for coluna in linha) for linha in linhas)
+        except Exception as exc:
+            plano = f"(EXPLAIN falhou: {exc})"
+        finally:
+            _explicando.reset(token)
+    logger.warning("Consulta lenta (%.1f ms): %s\nParâmetros: %r%s",
+                   duracao * 1000, statement, parameters, f"\nPlano:\n{plano}" if plano else "")
+
+
+def instrumentar_motor(motor):
+    # Aceita Engine ou AsyncEngine (os eventos ficam no motor síncrono interno)
+    motor = getattr(motor, "sync_engine", motor)
+    event.listen(motor, "before_cursor_execute", _antes_de_executar)
+    event.listen(motor, "after_cursor_execute", _depois_de_executar)
+    event.listen(motor, "handle_error", _erro_ao_executar)
+
+
+def instrumentar_modelos(base):
+    event.listen(base, "load", _contar_linha_carregada, propagate=True)
+
+
+# ----------------- ROTA E MIDDLEWARE -----------------
+class RotaInstrumentada(APIRoute):
+    # Mede separadamente o endpoint e o handler completo da rota
+    # (que inclui validação e serialização da resposta).
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        chamada = self.dependant.call
+        if chamada is None:
+            return
+        if asyncio.iscoroutinefunction(chamada):
+            async def cronometrado(*a, **k):
+                inicio = time.perf_counter()
+                try:
+                    return await chamada(*a, **k)
+                finally:
+                    _somar_endpoint(time.perf_counter() - inicio)
+        else:
+            def cronometrado(*a, **k):
+                inicio = time.perf_counter()
+                try:
+                    return chamada(*a, **k)
+                finally:
+                    _somar_endpoint(time.perf_counter() - inicio)
+        self.dependant.call = cronometrado
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def handler_cronometrado(request):
+            inicio = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                requisicao = _requisicao_atual.get()
+                if requisicao is not None:
+                    requisicao.tempo_rota += time.perf_counter() - inicio
+
+        return handler_cronometrado
+
+
+def _somar_endpoint(duracao):
+    requisicao = _requisicao_atual.get()
+    if requisicao is not None:
+        requisicao.tempo_endpoint += duracao
+
+
+async def middleware_instrumentacao(request, call_next):
+    requisicao = EstatisticaRequisicao()
+    token = _requisicao_atual.set(requisicao)
+    inicio = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        tempo_total = time.perf_counter() - inicio
+        _requisicao_atual.reset(token)
+        rota = request.scope.get("route")
+        caminho = getattr(rota, "path", None)
+        if caminho is not None:
+            metricas.registrar(request.method, caminho, requisicao, tempo_total)
+        if "primeira_resposta" not in partida.marcos:
+            partida.marcar("primeira_resposta")
@@ -1,19 +1,46 @@
-from typing import List
+import time
 
-from fastapi import FastAPI, Request, Form, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse
+INICIO_IMPORT = time.perf_counter()  # base das métricas de partida
+
+import asyncio
+from typing import List, Optional
+
+from fastapi import FastAPI, Request, Response, Form, File, UploadFile, Depends, HTTPException, Query, status
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
-from sqlalchemy.orm import Session, joinedload
-from fastapi.responses import RedirectResponse
-
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from fastapi.responses import RedirectResponse, StreamingResponse
+
+import busca
+import contadores
+from cache import cache
+import estaticos
+import exclusoes
+import exportacao
+from fila_matriculas import fila
+import importacao
+import horarios
+import instrumentacao
+import matriculas
+import migracoes
 import models
+import resumos
 import schemas
-from database import SessionLocal, engine, get_db
+import serializacao
+import versoes
+from database import (
+    AsyncSessionLocal, aquecer_pool, async_engine, async_replica_engines, engine, get_async_db,
+    middleware_roteamento, replica_engines
+)
+from paginacao import paginar, definir_cursor
 
-# Criação das tabelas
-models.Base.metadata.create_all(bind=engine)
+# O esquema é criado/atualizado por `python -m migracoes` (ver migracoes.py),
+# não no import: subir um worker não abre conexão nem inspeciona tabelas.
+instrumentacao.partida.inicio = INICIO_IMPORT
 
 app = FastAPI(
     title="API de Gerenciamento Escolar",
@@ -21,12 +48,103 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Instrumentação de SQL por rota (exposta em /admin/metricas)
+app.router.route_class = instrumentacao.RotaInstrumentada
+app.middleware("http")(instrumentacao.middleware_instrumentacao)
+for motor in [engine, *replica_engines, async_engine, *async_replica_engines]:
+    if motor is not None:
+        instrumentacao.instrumentar_motor(motor)
+instrumentacao.instrumentar_modelos(models.Base)
+
 # Middleware de sessões
 app.add_middleware(SessionMiddleware, secret_key="uma_chave_secreta_aqui")
 
-# Configuração de static e templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Leituras de GET vão para as réplicas (DATABASE_REPLICA_URLS), o resto para o primário
+app.middleware("http")(middleware_roteamento)
+
+# Configuração de static e templates. Os arquivos gerados por
+# `python -m estaticos` (static/dist/) saem pré-comprimidos e com cache imutável
+app.mount("/static", estaticos.ArquivosEstaticos(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["url_estatico"] = estaticos.url_estatico
+
+# Projeções do caminho rápido das listas (?rapido=true, ver serializacao.py)
+PROJECAO_PROFESSOR = serializacao.Projecao(schemas.ProfessorSchema, models.Professor)
+PROJECAO_ALUNO = serializacao.Projecao(schemas.AlunoSchema, models.Aluno)
+PROJECAO_CURSO = serializacao.Projecao(schemas.CursoSchema, models.Curso)
+PROJECAO_TURMA = serializacao.Projecao(schemas.TurmaDetalhesSchema, models.Turma)
+PROJECAO_MATRICULA = serializacao.Projecao(schemas.MatriculaDetalhesSchema, models.Matricula)
+
+# ----------------- INICIALIZAÇÃO -----------------
+def _precompilar_templates():
+    # O Jinja guarda os templates compilados; compila todos agora em vez de na
+    # primeira requisição de cada página
+    estaticos.carregar_manifesto()
+    for nome in templates.env.list_templates():
+        templates.env.get_template(nome)
+
+@app.on_event("startup")
+async def iniciar_aplicacao():
+    if migracoes.MIGRAR_NA_INICIALIZACAO:
+        await run_in_threadpool(migracoes.migrar)
+    await asyncio.gather(aquecer_pool(), run_in_threadpool(_precompilar_templates))
+
+@app.on_event("startup")
+async def iniciar_versoes():
+    await versoes.garantir()
+
+@app.on_event("startup")
+async def iniciar_contadores():
+    await contadores.reconciliar()
+    app.state.tarefa_contadores = asyncio.create_task(contadores.reconciliar_periodicamente())
+
+@app.on_event("shutdown")
+async def parar_contadores():
+    app.state.tarefa_contadores.cancel()
+
+@app.on_event("startup")
+async def iniciar_busca():
+    # A carga do índice roda em segundo plano; /search responde 503 até ela terminar
+    app.state.tarefa_busca = None
+    if busca.BUSCA_RECONSTRUIR or busca.BUSCA_INTERVALO_RECONSTRUCAO:
+        app.state.tarefa_busca = asyncio.create_task(busca.manter())
+
+@app.on_event("shutdown")
+async def parar_busca():
+    if app.state.tarefa_busca is not None:
+        app.state.tarefa_busca.cancel()
+
+@app.on_event("startup")
+async def iniciar_fila_matriculas():
+    app.state.tarefa_fila = fila.iniciar()
+
+@app.on_event("shutdown")
+async def parar_fila_matriculas():
+    app.state.tarefa_fila.cancel()
+
+@app.on_event("startup")
+async def concluir_inicializacao():
+    instrumentacao.partida.marcar("startup")
+
+# ----------------- REMOÇÃO -----------------
+# Alunos, cursos e turmas são removidos com DELETEs em conjunto (exclusoes.py),
+# um por tabela, tanto na rota individual quanto na de lote.
+def _ids_lote(lote):
+    if not lote.ids:
+        raise HTTPException(status_code=400, detail="Informe ao menos um id")
+    if len(lote.ids) > exclusoes.MAX_IDS_POR_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {exclusoes.MAX_IDS_POR_LOTE} ids por lote")
+    return lote.ids
+
+def _resultado_remocao(ids, removidos):
+    encontrados = set(removidos)
+    return {"removidos": removidos, "nao_encontrados": sorted(set(ids) - encontrados)}
+
+async def _invalidar_cache(namespace, ids):
+    if len(ids) == 1:
+        await cache.invalidar(namespace, ids[0])
+    else:
+        await cache.invalidar_namespace(namespace)
 
 # ----------------- LOGIN -----------------
 @app.get("/", response_class=HTMLResponse)
@@ -40,10 +158,10 @@ async def login(
     email: str = Form(...),
     senha: str = Form(...),
     tipo: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     user_model = models.Aluno if tipo.lower() == "aluno" else models.Professor
-    usuario = db.query(user_model).filter(user_model.email == email).first()
+    usuario = await db.scalar(select(user_model).where(user_model.email == email))
 
     if usuario:
         if usuario.senha != senha:
@@ -53,8 +171,11 @@ async def login(
         # Cadastra automaticamente
         novo_usuario = user_model(nome=email.split("@")[0], email=email, senha=senha)
         db.add(novo_usuario)
-        db.commit()
-        db.refresh(novo_usuario)
+        await versoes.incrementar(db, user_model.__tablename__)
+        await db.commit()
+        await db.refresh(novo_usuario)
+        busca.indexar("aluno" if user_model is models.Aluno else "professor", novo_usuario)
+        contadores.contadores.ajustar("alunos" if user_model is models.Aluno else "professores", 1)
         msg = f"{tipo.capitalize()} cadastrado com sucesso e logado!"
         usuario = novo_usuario
 
@@ -65,34 +186,35 @@ async def login(
 
 # ----------------- CADASTRO ALUNO -----------------
 @app.post("/register/aluno")
-async def register_aluno(nome: str = Form(...), email: str = Form(...), senha: str = Form(...), db: Session = Depends(get_db)):
-    if db.query(models.Aluno).filter(models.Aluno.email == email).first():
+async def register_aluno(nome: str = Form(...), email: str = Form(...), senha: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.Aluno.id_aluno).where(models.Aluno.email == email)):
         raise HTTPException(status_code=400, detail="Email já cadastrado")
     novo_aluno = models.Aluno(nome=nome, email=email, senha=senha)
     db.add(novo_aluno)
-    db.commit()
-    db.refresh(novo_aluno)
+    await versoes.incrementar(db, "alunos")
+    await db.commit()
+    await db.refresh(novo_aluno)
+    busca.indexar("aluno", novo_aluno)
+    contadores.contadores.ajustar("alunos", 1)
     return {"msg": "Cadastro realizado com sucesso!", "id_aluno": novo_aluno.id_aluno}
 
 
 
 # ----------------- HOME -----------------
 @app.get("/home", response_class=HTMLResponse)
-async def home_page(request: Request, db: Session = Depends(get_db)):
-    total_alunos = db.query(models.Aluno).count()
-    total_professores = db.query(models.Professor).count()
-    total_cursos = db.query(models.Curso).count()
-    total_turmas = db.query(models.Turma).count()
+async def home_page(request: Request):
+    # Totais vêm dos contadores em memória: nenhuma consulta ao banco aqui
+    totais = contadores.contadores.valores()
 
     return templates.TemplateResponse(
         "home.html",
         {
             "request": request,
             "user": None,
-            "total_alunos": total_alunos,
-            "total_professores": total_professores,
-            "total_cursos": total_cursos,
-            "total_turmas": total_turmas
+            "total_alunos": totais["alunos"],
+            "total_professores": totais["professores"],
+            "total_cursos": totais["cursos"],
+            "total_turmas": totais["turmas"]
         }
     )
 
@@ -101,243 +223,677 @@ async def home_page(request: Request, db: Session = Depends(get_db)):
 
 # ----------------- CRUD PROFESSORES -----------------
 @app.post("/professores/", response_model=schemas.ProfessorSchema, status_code=status.HTTP_201_CREATED, tags=["Professores"])
-def create_professor(professor: schemas.ProfessorCreate, db: Session = Depends(get_db)):
-    if db.query(models.Professor).filter(models.Professor.email == professor.email).first():
+async def create_professor(professor: schemas.ProfessorCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.Professor.id_professor).where(models.Professor.email == professor.email)):
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
     db_professor = models.Professor(**professor.dict())
     db.add(db_professor)
-    db.commit()
-    db.refresh(db_professor)
+    await versoes.incrementar(db, "professores")
+    await db.commit()
+    await db.refresh(db_professor)
+    busca.indexar("professor", db_professor)
+    contadores.contadores.ajustar("professores", 1)
     return db_professor
 
 @app.get("/professores/", response_model=List[schemas.ProfessorSchema], tags=["Professores"])
-def read_professores(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Professor).offset(skip).limit(limit).all()
+async def read_professores(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, rapido: bool = False, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "professores")
+    if nao_modificado is not None:
+        return nao_modificado
+    if rapido:
+        query = paginar(PROJECAO_PROFESSOR.select(), models.Professor.id_professor, skip, limit, cursor)
+        return await serializacao.listar(db, response, PROJECAO_PROFESSOR, query, "id_professor", limit)
+    query = paginar(select(models.Professor), models.Professor.id_professor, skip, limit, cursor)
+    return definir_cursor(response, (await db.scalars(query)).all(), "id_professor", limit)
 
 @app.get("/professores/{professor_id}", response_model=schemas.ProfessorSchema, tags=["Professores"])
-def read_professor(professor_id: int, db: Session = Depends(get_db)):
-    db_professor = db.query(models.Professor).filter(models.Professor.id_professor == professor_id).first()
+async def read_professor(request: Request, response: Response, professor_id: int, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "professores")
+    if nao_modificado is not None:
+        return nao_modificado
+    em_cache = await cache.obter("professor", professor_id, response.headers["ETag"])
+    if em_cache is not None:
+        return em_cache
+    db_professor = await db.get(models.Professor, professor_id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor não encontrado")
-    return db_professor
+    return await cache.guardar_objeto("professor", professor_id, schemas.ProfessorSchema, db_professor, response.headers["ETag"])
 
 @app.put("/professores/{professor_id}", response_model=schemas.ProfessorSchema, tags=["Professores"])
-def update_professor(professor_id: int, professor: schemas.ProfessorUpdate, db: Session = Depends(get_db)):
-    db_professor = db.query(models.Professor).filter(models.Professor.id_professor == professor_id).first()
+async def update_professor(professor_id: int, professor: schemas.ProfessorUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_professor = await db.get(models.Professor, professor_id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor não encontrado")
     update_data = professor.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_professor, key, value)
-    db.commit()
-    db.refresh(db_professor)
+    await versoes.incrementar(db, "professores")
+    await db.commit()
+    await db.refresh(db_professor)
+    busca.indexar("professor", db_professor)
+    await cache.invalidar("professor", professor_id)
+    await cache.invalidar_namespace("turma")  # TurmaDetalhesSchema embute o professor
     return db_professor
 
 @app.delete("/professores/{professor_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Professores"])
-def delete_professor(professor_id: int, db: Session = Depends(get_db)):
-    db_professor = db.query(models.Professor).filter(models.Professor.id_professor == professor_id).first()
+async def delete_professor(professor_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_professor = await db.get(models.Professor, professor_id)
     if not db_professor:
         raise HTTPException(status_code=404, detail="Professor não encontrado")
-    db.delete(db_professor)
-    db.commit()
+    await db.delete(db_professor)
+    await versoes.incrementar(db, "professores")
+    await db.commit()
+    busca.indice.remover("professor", professor_id)
+    contadores.contadores.ajustar("professores", -1)
+    await cache.invalidar("professor", professor_id)
+    await cache.invalidar_namespace("turma")
 
 # ----------------- CRUD ALUNOS -----------------
 @app.post("/alunos/", response_model=schemas.AlunoSchema, status_code=status.HTTP_201_CREATED, tags=["Alunos"])
-def create_aluno(aluno: schemas.AlunoCreate, db: Session = Depends(get_db)):
-    if db.query(models.Aluno).filter(models.Aluno.email == aluno.email).first():
+async def create_aluno(aluno: schemas.AlunoCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.Aluno.id_aluno).where(models.Aluno.email == aluno.email)):
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
     db_aluno = models.Aluno(**aluno.dict())
     db.add(db_aluno)
-    db.commit()
-    db.refresh(db_aluno)
+    await versoes.incrementar(db, "alunos")
+    await db.commit()
+    await db.refresh(db_aluno)
+    busca.indexar("aluno", db_aluno)
+    contadores.contadores.ajustar("alunos", 1)
     return db_aluno
 
 @app.get("/alunos/", response_model=List[schemas.AlunoSchema], tags=["Alunos"])
-def read_alunos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    alunos = db.query(models.Aluno).offset(skip).limit(limit).all()
+async def read_alunos(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, status: Optional[str] = None, rapido: bool = False, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "alunos")
+    if nao_modificado is not None:
+        return nao_modificado
+    query = PROJECAO_ALUNO.select() if rapido else select(models.Aluno)
+    if status:
+        query = query.where(models.Aluno.status == status)
+    if rapido:
+        linhas = (await db.execute(paginar(query, models.Aluno.id_aluno, skip, limit, cursor))).all()
+        definir_cursor(response, linhas, "id_aluno", limit)
+        resposta = PROJECAO_ALUNO.dicts(linhas)
+        for aluno in resposta:
+            if not aluno["status"]:
+                aluno["status"] = "ativo"
+        return serializacao.responder(response, resposta)
+    alunos = (await db.scalars(paginar(query, models.Aluno.id_aluno, skip, limit, cursor))).all()
+    definir_cursor(response, alunos, "id_aluno", limit)
 
     # Ajusta status só para a resposta
-    response = []
+    resposta = []
     for aluno in alunos:
         aluno_dict = aluno.__dict__.copy()  # copia o objeto para não mexer no DB
         if not aluno_dict.get("status"):
             aluno_dict["status"] = "ativo"
-        response.append(aluno_dict)
-    
-    return response
+        resposta.append(aluno_dict)
+
+    return resposta
 
 @app.post("/register/aluno")
-def register_aluno(data: schemas.AlunoCreate, db: Session = Depends(get_db)):
-    if db.query(models.Aluno).filter(models.Aluno.email == data.email).first():
+async def register_aluno(data: schemas.AlunoCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.Aluno.id_aluno).where(models.Aluno.email == data.email)):
         raise HTTPException(status_code=400, detail="Email já cadastrado")
-    
+
     novo_aluno = models.Aluno(nome=data.nome, email=data.email, senha=data.senha, status="ativo")
     db.add(novo_aluno)
-    db.commit()
-    db.refresh(novo_aluno)
-    
+    await versoes.incrementar(db, "alunos")
+    await db.commit()
+    await db.refresh(novo_aluno)
+    busca.indexar("aluno", novo_aluno)
+    contadores.contadores.ajustar("alunos", 1)
+
     return {"msg": "Cadastro realizado com sucesso!", "id_aluno": novo_aluno.id_aluno}
 
 @app.post("/alunos/create", response_model=schemas.AlunoSchema, status_code=status.HTTP_201_CREATED)
-def criar_aluno(aluno: schemas.AlunoCreate, db: Session = Depends(get_db)):
-    if db.query(models.Aluno).filter(models.Aluno.email == aluno.email).first():
+async def criar_aluno(aluno: schemas.AlunoCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.Aluno.id_aluno).where(models.Aluno.email == aluno.email)):
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
     novo_aluno = models.Aluno(**aluno.dict())
     db.add(novo_aluno)
-    db.commit()
-    db.refresh(novo_aluno)
+    await versoes.incrementar(db, "alunos")
+    await db.commit()
+    await db.refresh(novo_aluno)
+    busca.indexar("aluno", novo_aluno)
+    contadores.contadores.ajustar("alunos", 1)
     return novo_aluno
 
 @app.get("/alunos/{aluno_id}", response_model=schemas.AlunoSchema, tags=["Alunos"])
-def read_aluno(aluno_id: int, db: Session = Depends(get_db)):
-    db_aluno = db.query(models.Aluno).filter(models.Aluno.id_aluno == aluno_id).first()
+async def read_aluno(request: Request, response: Response, aluno_id: int, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "alunos")
+    if nao_modificado is not None:
+        return nao_modificado
+    em_cache = await cache.obter("aluno", aluno_id, response.headers["ETag"])
+    if em_cache is not None:
+        return em_cache
+    db_aluno = await db.get(models.Aluno, aluno_id)
     if not db_aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
-    return db_aluno
+    return await cache.guardar_objeto("aluno", aluno_id, schemas.AlunoSchema, db_aluno, response.headers["ETag"])
 
 @app.put("/alunos/{aluno_id}", response_model=schemas.AlunoSchema, tags=["Alunos"])
-def update_aluno(aluno_id: int, aluno: schemas.AlunoUpdate, db: Session = Depends(get_db)):
-    db_aluno = db.query(models.Aluno).filter(models.Aluno.id_aluno == aluno_id).first()
+async def update_aluno(aluno_id: int, aluno: schemas.AlunoUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_aluno = await db.get(models.Aluno, aluno_id)
     if not db_aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
     update_data = aluno.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_aluno, key, value)
-    db.commit()
-    db.refresh(db_aluno)
+    await versoes.incrementar(db, "alunos")
+    await db.commit()
+    await db.refresh(db_aluno)
+    busca.indexar("aluno", db_aluno)
+    await cache.invalidar("aluno", aluno_id)
     return db_aluno
 
 @app.delete("/alunos/{aluno_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Alunos"])
-def delete_aluno(aluno_id: int, db: Session = Depends(get_db)):
-    db_aluno = db.query(models.Aluno).filter(models.Aluno.id_aluno == aluno_id).first()
-    if not db_aluno:
+async def delete_aluno(aluno_id: int, db: AsyncSession = Depends(get_async_db)):
+    if not await _remover_alunos(db, [aluno_id]):
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
-    db.delete(db_aluno)
-    db.commit()
+
+@app.post("/alunos/lote/remover", response_model=schemas.RemocaoLoteResultado, tags=["Alunos"])
+async def delete_alunos_lote(lote: schemas.RemocaoLote, db: AsyncSession = Depends(get_async_db)):
+    return _resultado_remocao(lote.ids, await _remover_alunos(db, _ids_lote(lote)))
+
+async def _remover_alunos(db, ids):
+    removidos, turmas = await db.run_sync(exclusoes.excluir_alunos, ids)
+    if not removidos:
+        return removidos
+    await versoes.incrementar(db, "alunos")
+    await db.commit()
+    for aluno_id in removidos:
+        busca.indice.remover("aluno", aluno_id)
+    contadores.contadores.ajustar("alunos", -len(removidos))
+    await _invalidar_cache("aluno", removidos)
+    for id_turma in turmas:
+        fila.liberar(id_turma)
+    return removidos
 
 # ----------------- CRUD CURSOS -----------------
 @app.post("/cursos/", response_model=schemas.CursoSchema, status_code=status.HTTP_201_CREATED, tags=["Cursos"])
-def create_curso(curso: schemas.CursoCreate, db: Session = Depends(get_db)):
-    if db.query(models.Curso).filter(models.Curso.nome == curso.nome).first():
+async def create_curso(curso: schemas.CursoCreate, db: AsyncSession = Depends(get_async_db)):
+    if await db.scalar(select(models.Curso.id_curso).where(models.Curso.nome == curso.nome)):
         raise HTTPException(status_code=400, detail="Nome do curso já existe")
     db_curso = models.Curso(**curso.dict())
     db.add(db_curso)
-    db.commit()
-    db.refresh(db_curso)
+    await versoes.incrementar(db, "cursos")
+    await db.commit()
+    await db.refresh(db_curso)
+    busca.indexar("curso", db_curso)
+    contadores.contadores.ajustar("cursos", 1)
     return db_curso
 
 @app.get("/cursos/", response_model=List[schemas.CursoSchema], tags=["Cursos"])
-def read_cursos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Curso).offset(skip).limit(limit).all()
+async def read_cursos(request: Request, response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, rapido: bool = False, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "cursos")
+    if nao_modificado is not None:
+        return nao_modificado
+    if rapido:
+        query = paginar(PROJECAO_CURSO.select(), models.Curso.id_curso, skip, limit, cursor)
+        return await serializacao.listar(db, response, PROJECAO_CURSO, query, "id_curso", limit)
+    query = paginar(select(models.Curso), models.Curso.id_curso, skip, limit, cursor)
+    return definir_cursor(response, (await db.scalars(query)).all(), "id_curso", limit)
 
 @app.get("/cursos/{curso_id}", response_model=schemas.CursoSchema, tags=["Cursos"])
-def read_curso(curso_id: int, db: Session = Depends(get_db)):
-    db_curso = db.query(models.Curso).filter(models.Curso.id_curso == curso_id).first()
+async def read_curso(request: Request, response: Response, curso_id: int, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "cursos")
+    if nao_modificado is not None:
+        return nao_modificado
+    em_cache = await cache.obter("curso", curso_id, response.headers["ETag"])
+    if em_cache is not None:
+        return em_cache
+    db_curso = await db.get(models.Curso, curso_id)
     if not db_curso:
         raise HTTPException(status_code=404, detail="Curso não encontrado")
-    return db_curso
+    return await cache.guardar_objeto("curso", curso_id, schemas.CursoSchema, db_curso, response.headers["ETag"])
 
 @app.delete("/cursos/{curso_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Cursos"])
-def delete_curso(curso_id: int, db: Session = Depends(get_db)):
-    db_curso = db.query(models.Curso).filter(models.Curso.id_curso == curso_id).first()
-    if not db_curso:
+async def delete_curso(curso_id: int, db: AsyncSession = Depends(get_async_db)):
+    if not await _remover_cursos(db, [curso_id]):
         raise HTTPException(status_code=404, detail="Curso não encontrado")
-    db.delete(db_curso)
-    db.commit()
+
+@app.post("/cursos/lote/remover", response_model=schemas.RemocaoLoteResultado, tags=["Cursos"])
+async def delete_cursos_lote(lote: schemas.RemocaoLote, db: AsyncSession = Depends(get_async_db)):
+    return _resultado_remocao(lote.ids, await _remover_cursos(db, _ids_lote(lote)))
+
+async def _remover_cursos(db, ids):
+    # Versões primeiro, como nas outras escritas de turmas (_travar_turmas):
+    # mesma ordem de travas que create_turma/update_turma
+    await versoes.incrementar(db, "cursos", "turmas")
+    removidos, turmas = await db.run_sync(exclusoes.excluir_cursos, ids)
+    if not removidos:
+        await db.rollback()
+        return removidos
+    await db.commit()
+    for curso_id in removidos:
+        busca.indice.remover("curso", curso_id)
+    contadores.contadores.ajustar("cursos", -len(removidos))
+    contadores.contadores.ajustar("turmas", -len(turmas))
+    await _invalidar_cache("curso", removidos)
+    await cache.invalidar_namespace("turma")  # turmas do curso foram removidas em cascata
+    for turma_id in turmas:
+        fila.invalidar(turma_id)
+        horarios.indice.remover(turma_id)
+    return removidos
 
 # ----------------- CRUD TURMAS -----------------
 @app.post("/turmas/", response_model=schemas.TurmaSchema, status_code=status.HTTP_201_CREATED, tags=["Turmas"])
-def create_turma(turma: schemas.TurmaCreate, db: Session = Depends(get_db)):
-    if not db.query(models.Curso).filter(models.Curso.id_curso == turma.id_curso).first():
+async def create_turma(turma: schemas.TurmaCreate, db: AsyncSession = Depends(get_async_db)):
+    intervalos = _interpretar_horario(turma.horario)
+    versao = await _travar_turmas(db)
+    if not await db.get(models.Curso, turma.id_curso):
         raise HTTPException(status_code=404, detail="Curso não encontrado")
-    if not db.query(models.Professor).filter(models.Professor.id_professor == turma.id_professor).first():
+    if not await db.get(models.Professor, turma.id_professor):
         raise HTTPException(status_code=404, detail="Professor não encontrado")
-    db_turma = models.Turma(**turma.dict())
+    _verificar_conflitos(turma.sala, turma.id_professor, intervalos)
+    db_turma = models.Turma(**{**turma.dict(), "horario": horarios.formatar(intervalos)})
     db.add(db_turma)
-    db.commit()
-    db.refresh(db_turma)
+    await db.flush()
+    await db.run_sync(resumos.registrar_turma, None, resumos.atributos(db_turma))
+    await db.commit()
+    await db.refresh(db_turma)
+    horarios.indice.definir(db_turma.id_turma, db_turma.sala, db_turma.id_professor, intervalos, versao)
+    contadores.contadores.ajustar("turmas", 1)
+    return db_turma
+
+# Conflitos de sala e professor (horarios.py). A versão de turmas é incrementada
+# antes de tudo: o UPDATE trava a linha até o commit, então as escritas de
+# turmas ficam em fila e o índice é conferido contra a versão imediatamente
+# anterior à nossa (recarregado se outro worker gravou turmas nesse meio).
+def _interpretar_horario(texto):
+    try:
+        return horarios.interpretar(texto)
+    except horarios.HorarioInvalido as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+async def _travar_turmas(db):
+    await versoes.incrementar(db, "turmas")
+    versao = (await versoes.obter(db, ["turmas"]))["turmas"]
+    await db.run_sync(horarios.sincronizar, versao - 1)
+    return versao
+
+def _verificar_conflitos(sala, id_professor, intervalos, id_turma=None):
+    conflitos = horarios.indice.conflitos(sala, id_professor, intervalos, ignorar={id_turma})
+    if conflitos:
+        raise HTTPException(status_code=409, detail={"mensagem": "Conflito de horário", "conflitos": conflitos})
+
+@app.put("/turmas/{turma_id}", response_model=schemas.TurmaSchema, tags=["Turmas"])
+async def update_turma(turma_id: int, turma: schemas.TurmaUpdate, db: AsyncSession = Depends(get_async_db)):
+    update_data = turma.dict(exclude_unset=True)
+    if "horario" in update_data:
+        intervalos = _interpretar_horario(update_data["horario"])
+        update_data["horario"] = horarios.formatar(intervalos)
+    versao = await _travar_turmas(db)
+    db_turma = await db.get(models.Turma, turma_id)
+    if not db_turma:
+        raise HTTPException(status_code=404, detail="Turma não encontrada")
+    if "id_curso" in update_data and not await db.get(models.Curso, update_data["id_curso"]):
+        raise HTTPException(status_code=404, detail="Curso não encontrado")
+    if "id_professor" in update_data and not await db.get(models.Professor, update_data["id_professor"]):
+        raise HTTPException(status_code=404, detail="Professor não encontrado")
+    antes = resumos.atributos(db_turma)
+    for key, value in update_data.items():
+        setattr(db_turma, key, value)
+    try:
+        intervalos = horarios.interpretar(db_turma.horario)
+    except horarios.HorarioInvalido:
+        intervalos = []  # horário antigo fora do formato e não alterado: sem checagem
+    if update_data.keys() & {"horario", "sala", "id_professor"}:
+        _verificar_conflitos(db_turma.sala, db_turma.id_professor, intervalos, turma_id)
+    await db.run_sync(resumos.registrar_turma, antes, resumos.atributos(db_turma))
+    await db.commit()
+    await db.refresh(db_turma)
+    horarios.indice.definir(turma_id, db_turma.sala, db_turma.id_professor, intervalos, versao)
+    await cache.invalidar("turma", turma_id)
+    fila.invalidar(turma_id)
+    if antes[4] != db_turma.capacidade:
+        # Vagas abertas pela nova capacidade vão para quem está na espera
+        fila.liberar(turma_id)
     return db_turma
 
+@app.post("/turmas/validar-grade", response_model=schemas.ValidacaoGrade, tags=["Turmas"])
+async def validar_grade(grade: schemas.GradeValidacao, db: AsyncSession = Depends(get_async_db)):
+    # Confere uma grade inteira (ex.: o semestre) sem gravar nada: horários
+    # válidos, conflitos com as turmas existentes e entre os próprios itens
+    if len(grade.turmas) > horarios.MAX_ITENS_GRADE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {horarios.MAX_ITENS_GRADE} turmas por grade")
+    if grade.considerar_existentes:
+        versao = (await versoes.obter(db, ["turmas"]))["turmas"]
+        await db.run_sync(horarios.sincronizar, versao)
+    return horarios.validar_grade(grade.turmas, grade.considerar_existentes)
+
 @app.get("/turmas/", response_model=List[schemas.TurmaDetalhesSchema], tags=["Turmas"])
-def read_turmas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Turma).options(
-        joinedload(models.Turma.curso),
-        joinedload(models.Turma.professor)
-    ).offset(skip).limit(limit).all()
+async def read_turmas(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    id_curso: Optional[int] = None,
+    id_professor: Optional[int] = None,
+    rapido: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    nao_modificado = await versoes.condicional(request, response, db, "turmas", "cursos", "professores")
+    if nao_modificado is not None:
+        return nao_modificado
+    if rapido:
+        query = PROJECAO_TURMA.select()
+    else:
+        query = select(models.Turma).options(
+            joinedload(models.Turma.curso),
+            joinedload(models.Turma.professor)
+        )
+    if status:
+        query = query.where(models.Turma.status == status)
+    if id_curso is not None:
+        query = query.where(models.Turma.id_curso == id_curso)
+    if id_professor is not None:
+        query = query.where(models.Turma.id_professor == id_professor)
+    query = paginar(query, models.Turma.id_turma, skip, limit, cursor)
+    if rapido:
+        return await serializacao.listar(db, response, PROJECAO_TURMA, query, "id_turma", limit)
+    turmas = (await db.scalars(query)).all()
+    return definir_cursor(response, turmas, "id_turma", limit)
 
 @app.get("/turmas/{turma_id}", response_model=schemas.TurmaDetalhesSchema, tags=["Turmas"])
-def read_turma(turma_id: int, db: Session = Depends(get_db)):
-    db_turma = db.query(models.Turma).options(
+async def read_turma(request: Request, response: Response, turma_id: int, db: AsyncSession = Depends(get_async_db)):
+    nao_modificado = await versoes.condicional(request, response, db, "turmas", "cursos", "professores")
+    if nao_modificado is not None:
+        return nao_modificado
+    em_cache = await cache.obter("turma", turma_id, response.headers["ETag"])
+    if em_cache is not None:
+        return em_cache
+    db_turma = await db.get(models.Turma, turma_id, options=[
         joinedload(models.Turma.curso),
         joinedload(models.Turma.professor)
-    ).filter(models.Turma.id_turma == turma_id).first()
+    ])
     if not db_turma:
         raise HTTPException(status_code=404, detail="Turma não encontrada")
-    return db_turma
+    return await cache.guardar_objeto("turma", turma_id, schemas.TurmaDetalhesSchema, db_turma, response.headers["ETag"])
 
 @app.delete("/turmas/{turma_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Turmas"])
-def delete_turma(turma_id: int, db: Session = Depends(get_db)):
-    db_turma = db.query(models.Turma).filter(models.Turma.id_turma == turma_id).first()
-    if not db_turma:
+async def delete_turma(turma_id: int, db: AsyncSession = Depends(get_async_db)):
+    if not await _remover_turmas(db, [turma_id]):
         raise HTTPException(status_code=404, detail="Turma não encontrada")
-    db.delete(db_turma)
-    db.commit()
 
-# ----------------- CRUD MATRÍCULAS -----------------
-@app.post("/matriculas/", response_model=schemas.MatriculaSchema, status_code=status.HTTP_201_CREATED, tags=["Matrículas"])
-def create_matricula(matricula: schemas.MatriculaCreate, db: Session = Depends(get_db)):
-    if not db.query(models.Aluno).filter(models.Aluno.id_aluno == matricula.id_aluno).first():
-        raise HTTPException(status_code=404, detail="Aluno não encontrado")
-    if not db.query(models.Turma).filter(models.Turma.id_turma == matricula.id_turma).first():
+@app.post("/turmas/lote/remover", response_model=schemas.RemocaoLoteResultado, tags=["Turmas"])
+async def delete_turmas_lote(lote: schemas.RemocaoLote, db: AsyncSession = Depends(get_async_db)):
+    return _resultado_remocao(lote.ids, await _remover_turmas(db, _ids_lote(lote)))
+
+async def _remover_turmas(db, ids):
+    await versoes.incrementar(db, "turmas")
+    removidos = await db.run_sync(exclusoes.excluir_turmas, ids)
+    if not removidos:
+        await db.rollback()
+        return removidos
+    await db.commit()
+    contadores.contadores.ajustar("turmas", -len(removidos))
+    await _invalidar_cache("turma", removidos)
+    for turma_id in removidos:
+        fila.invalidar(turma_id)
+        horarios.indice.remover(turma_id)
+    return removidos
+
+@app.get("/turmas/{turma_id}/vagas", response_model=schemas.VagasTurma, tags=["Turmas"])
+async def read_vagas_turma(turma_id: int):
+    # Contagem da fila de matrículas, incluindo pedidos ainda não gravados
+    vagas = await fila.vagas(turma_id)
+    if vagas is None:
         raise HTTPException(status_code=404, detail="Turma não encontrada")
-    if db.query(models.Matricula).filter(models.Matricula.id_aluno == matricula.id_aluno, models.Matricula.id_turma == matricula.id_turma).first():
-        raise HTTPException(status_code=400, detail="Aluno já matriculado nesta turma")
-    db_matricula = models.Matricula(**matricula.dict())
-    db.add(db_matricula)
-    db.commit()
-    db.refresh(db_matricula)
-    return db_matricula
+    return vagas
+
+# ----------------- CRUD MATRÍCULAS -----------------
+ERROS_FILA = {
+    "lotada": (409, "Turma lotada"),
+    "aluno_nao_encontrado": (404, "Aluno não encontrado"),
+    "turma_nao_encontrada": (404, "Turma não encontrada"),
+    "ja_matriculado": (400, "Aluno já matriculado nesta turma"),
+    "ja_na_espera": (400, "Aluno já está na lista de espera desta turma"),
+}
+
+@app.post(
+    "/matriculas/", response_model=schemas.MatriculaSchema, status_code=status.HTTP_201_CREATED, tags=["Matrículas"],
+    responses={202: {"model": schemas.DecisaoMatricula, "description": "Turma lotada; aluno na lista de espera"}}
+)
+async def create_matricula(matricula: schemas.MatriculaCreate):
+    # Passa pela fila de matrículas (fila_matriculas.py): vagas contadas em
+    # memória e gravação agrupada por turma, sem conexão presa por requisição
+    decisao = await fila.matricular(matricula.id_aluno, matricula.id_turma)
+    if decisao["status"] == "aceita":
+        return decisao
+    if decisao["status"] == "lista_espera":
+        return JSONResponse(decisao, status_code=status.HTTP_202_ACCEPTED)
+    raise HTTPException(*ERROS_FILA[decisao["status"]])
+
+@app.post("/matriculas/fila", response_model=schemas.DecisaoMatricula, tags=["Matrículas"])
+async def enfileirar_matricula(matricula: schemas.MatriculaCreate):
+    # Mesma fila, mas sempre responde a decisão (aceita, lista_espera, lotada...)
+    return await fila.matricular(matricula.id_aluno, matricula.id_turma)
+
+@app.post("/matriculas/lote", response_model=schemas.MatriculaLoteResultado, tags=["Matrículas"])
+async def create_matriculas_lote(lote: schemas.MatriculaLoteCreate, db: AsyncSession = Depends(get_async_db)):
+    pares = [(id_aluno, id_turma) for id_turma in dict.fromkeys(lote.id_turmas) for id_aluno in dict.fromkeys(lote.id_alunos)]
+    if not pares:
+        raise HTTPException(status_code=400, detail="Informe ao menos um aluno e uma turma")
+    if len(pares) > matriculas.MAX_PARES_POR_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {matriculas.MAX_PARES_POR_LOTE} matrículas por lote")
+    itens = await db.run_sync(matriculas.matricular_em_lote, pares)
+    for id_turma in lote.id_turmas:
+        fila.invalidar(id_turma)
+    return {"criadas": sum(item["status"] == "criada" for item in itens), "itens": itens}
 
 @app.get("/matriculas/", response_model=List[schemas.MatriculaDetalhesSchema], tags=["Matrículas"])
-def read_matriculas(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Matricula).options(
-        joinedload(models.Matricula.aluno),
-        joinedload(models.Matricula.turma).joinedload(models.Turma.curso),
-        joinedload(models.Matricula.turma).joinedload(models.Turma.professor)
-    ).offset(skip).limit(limit).all()
+async def read_matriculas(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    id_aluno: Optional[int] = None,
+    id_turma: Optional[int] = None,
+    rapido: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if rapido:
+        query = PROJECAO_MATRICULA.select()
+    else:
+        query = select(models.Matricula).options(
+            joinedload(models.Matricula.aluno),
+            joinedload(models.Matricula.turma).joinedload(models.Turma.curso),
+            joinedload(models.Matricula.turma).joinedload(models.Turma.professor)
+        )
+    if id_aluno is not None:
+        query = query.where(models.Matricula.id_aluno == id_aluno)
+    if id_turma is not None:
+        query = query.where(models.Matricula.id_turma == id_turma)
+    query = paginar(query, models.Matricula.id_matricula, skip, limit, cursor)
+    if rapido:
+        return await serializacao.listar(db, response, PROJECAO_MATRICULA, query, "id_matricula", limit)
+    matriculas = (await db.scalars(query)).all()
+    return definir_cursor(response, matriculas, "id_matricula", limit)
+
+@app.get("/matriculas/exportar", tags=["Matrículas"])
+async def exportar_matriculas(
+    formato: str = "ndjson",
+    gzip: bool = False,
+    id_aluno: Optional[int] = None,
+    id_turma: Optional[int] = None
+):
+    if formato not in exportacao.FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser ndjson ou csv")
+    exportar = exportacao.exportar_matriculas_async if AsyncSessionLocal is not None else exportacao.exportar_matriculas
+    nome_arquivo = f"matriculas.{formato}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        exportar(formato, gzip, id_aluno, id_turma),
+        media_type="application/gzip" if gzip else exportacao.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
+    )
 
 @app.delete("/matriculas/{matricula_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Matrículas"])
-def delete_matricula(matricula_id: int, db: Session = Depends(get_db)):
-    db_matricula = db.query(models.Matricula).filter(models.Matricula.id_matricula == matricula_id).first()
+async def delete_matricula(matricula_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_matricula = await db.get(models.Matricula, matricula_id)
     if not db_matricula:
         raise HTTPException(status_code=404, detail="Matrícula não encontrada")
-    db.delete(db_matricula)
-    db.commit()
+    await db.run_sync(resumos.travar_turmas, [db_matricula.id_turma])
+    await db.delete(db_matricula)
+    await db.run_sync(resumos.registrar_matriculas, {db_matricula.id_turma: -1})
+    await db.commit()
+    fila.liberar(db_matricula.id_turma)
+
+# ----------------- ANÁLISES -----------------
+@app.get("/analises/matriculas", response_model=List[schemas.GrupoMatriculas], tags=["Análises"])
+async def analisar_matriculas(
+    response: Response,
+    por: str = "curso",
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Ocupação e matrículas por curso, professor, status ou turma, lidas das
+    # tabelas de resumo (resumos.py): nenhuma contagem sobre matriculas
+    if por not in resumos.DIMENSOES:
+        raise HTTPException(status_code=400, detail=f"por deve ser um de: {', '.join(resumos.DIMENSOES)}")
+    query, coluna_id = resumos.consulta(por)
+    if coluna_id is None:
+        # Poucos status distintos: sem paginação
+        return [resumos.grupo(linha) for linha in await db.execute(query)]
+    linhas = (await db.execute(paginar(query, coluna_id, skip, limit, cursor))).all()
+    return [resumos.grupo(linha) for linha in definir_cursor(response, linhas, "chave", limit)]
+
+# ----------------- BUSCA -----------------
+@app.get("/search", response_model=schemas.PaginaBusca, tags=["Busca"])
+async def buscar(
+    q: str = Query(..., min_length=2, max_length=100),
+    tipo: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    # Alunos, professores e cursos por nome, e-mail ou descrição (prefixo ou
+    # trecho), ordenados por relevância. Atendida pelo índice em memória.
+    if tipo is not None and tipo not in busca.TIPOS:
+        raise HTTPException(status_code=400, detail=f"Tipo deve ser um de: {', '.join(busca.TIPOS)}")
+    if not busca.disponivel():
+        raise HTTPException(status_code=503, detail="Índice de busca em carga", headers={"Retry-After": "5"})
+    total, itens = busca.indice.buscar(q, tipo, skip, limit)
+    return {"total": total, "itens": itens}
+
+# ----------------- IMPORTAÇÃO EM LOTE -----------------
+@app.post("/importacao/{entidade}", response_model=schemas.RelatorioImportacao, tags=["Importação"])
+async def importar_arquivo(
+    entidade: str,
+    arquivo: UploadFile = File(...),
+    formato: Optional[str] = Form(None),
+    tamanho_lote: int = Form(importacao.TAMANHO_LOTE)
+):
+    if entidade not in importacao.ENTIDADES:
+        raise HTTPException(status_code=404, detail="Entidade não suportada para importação")
+    try:
+        formato = importacao.detectar_formato(arquivo.filename, formato)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    # Leitura do arquivo e validação são trabalho de CPU/IO bloqueante:
+    # rodam num thread do pool
+    relatorio = await run_in_threadpool(importacao.importar_arquivo, entidade, arquivo.file, formato, max(1, tamanho_lote))
+    if entidade in contadores.MODELOS:
+        contadores.contadores.ajustar(entidade, relatorio.inseridos)
+    if entidade == "matriculas":
+        fila.invalidar()
+    return relatorio.dict()
 
 # ----------------- CONSULTAS AVANÇADAS -----------------
+MAX_TURMAS_POR_LOTE = 200
+
+# As consultas abaixo são feitas por junção com matriculas, em uma única ida
+# ao banco por página, em vez de percorrer turma.matriculas / aluno.matriculas.
+@app.get("/turmas/alunos/lote", response_model=List[schemas.RosterTurmaSchema], tags=["Consultas Avançadas"])
+async def get_alunos_por_turmas(ids: List[int] = Query(...), db: AsyncSession = Depends(get_async_db)):
+    # Rosters de várias turmas (tela de horários) com duas consultas no total
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_TURMAS_POR_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_TURMAS_POR_LOTE} turmas por consulta")
+    existentes = (await db.scalars(select(models.Turma.id_turma).where(models.Turma.id_turma.in_(ids)))).all()
+    rosters = {id_turma: [] for id_turma in sorted(existentes)}
+    linhas = await db.execute(
+        select(models.Matricula.id_turma, models.Aluno)
+        .join(models.Aluno, models.Matricula.id_aluno == models.Aluno.id_aluno)
+        .where(models.Matricula.id_turma.in_(rosters))
+        .order_by(models.Matricula.id_turma, models.Aluno.id_aluno)
+    )
+    for id_turma, aluno in linhas:
+        rosters[id_turma].append(aluno)
+    return [{"id_turma": id_turma, "alunos": alunos} for id_turma, alunos in rosters.items()]
+
 @app.get("/turmas/{turma_id}/alunos", response_model=List[schemas.AlunoSchema], tags=["Consultas Avançadas"])
-def get_alunos_por_turma(turma_id: int, db: Session = Depends(get_db)):
-    turma = db.query(models.Turma).filter(models.Turma.id_turma == turma_id).first()
-    if not turma:
+async def get_alunos_por_turma(response: Response, turma_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if not await db.scalar(select(models.Turma.id_turma).where(models.Turma.id_turma == turma_id)):
         raise HTTPException(status_code=404, detail="Turma não encontrada")
-    return [matricula.aluno for matricula in turma.matriculas]
+    query = (
+        select(models.Aluno)
+        .join(models.Matricula, models.Matricula.id_aluno == models.Aluno.id_aluno)
+        .where(models.Matricula.id_turma == turma_id)
+    )
+    alunos = (await db.scalars(paginar(query, models.Aluno.id_aluno, skip, limit, cursor))).all()
+    return definir_cursor(response, alunos, "id_aluno", limit)
 
 @app.get("/alunos/{aluno_id}/turmas", response_model=List[schemas.TurmaDetalhesSchema], tags=["Consultas Avançadas"])
-def get_turmas_por_aluno(aluno_id: int, db: Session = Depends(get_db)):
-    aluno = db.query(models.Aluno).filter(models.Aluno.id_aluno == aluno_id).first()
-    if not aluno:
+async def get_turmas_por_aluno(response: Response, aluno_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if not await db.scalar(select(models.Aluno.id_aluno).where(models.Aluno.id_aluno == aluno_id)):
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
-    return [matricula.turma for matricula in aluno.matriculas]
+    query = (
+        select(models.Turma)
+        .join(models.Matricula, models.Matricula.id_turma == models.Turma.id_turma)
+        .where(models.Matricula.id_aluno == aluno_id)
+        .options(joinedload(models.Turma.curso), joinedload(models.Turma.professor))
+    )
+    turmas = (await db.scalars(paginar(query, models.Turma.id_turma, skip, limit, cursor))).all()
+    return definir_cursor(response, turmas, "id_turma", limit)
 
 @app.get("/professores/{professor_id}/turmas", response_model=List[schemas.TurmaDetalhesSchema], tags=["Consultas Avançadas"])
-def get_turmas_por_professor(professor_id: int, db: Session = Depends(get_db)):
-    professor = db.query(models.Professor).options(
-        joinedload(models.Professor.turmas).joinedload(models.Turma.curso),
-        joinedload(models.Professor.turmas).joinedload(models.Turma.professor)
-    ).filter(models.Professor.id_professor == professor_id).first()
-    if not professor:
+async def get_turmas_por_professor(response: Response, professor_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if not await db.scalar(select(models.Professor.id_professor).where(models.Professor.id_professor == professor_id)):
         raise HTTPException(status_code=404, detail="Professor não encontrado")
-    return professor.turmas
+    query = (
+        select(models.Turma)
+        .where(models.Turma.id_professor == professor_id)
+        .options(joinedload(models.Turma.curso), joinedload(models.Turma.professor))
+    )
+    turmas = (await db.scalars(paginar(query, models.Turma.id_turma, skip, limit, cursor))).all()
+    return definir_cursor(response, turmas, "id_turma", limit)
+
+# ----------------- ADMINISTRAÇÃO -----------------
+@app.get("/admin/cache", tags=["Administração"])
+async def estatisticas_cache():
+    return cache.estatisticas()
+
+@app.get("/admin/busca", tags=["Administração"])
+async def estatisticas_busca():
+    return busca.indice.estatisticas()
+
+@app.post("/admin/busca/reconstruir", tags=["Administração"])
+async def reconstruir_busca():
+    return await busca.reconstruir()
+
+@app.post("/admin/resumos/reconstruir", tags=["Administração"])
+async def reconstruir_resumos(db: AsyncSession = Depends(get_async_db)):
+    # Mesmo recálculo de `python -m resumos reconstruir`
+    linhas = await db.run_sync(resumos.reconstruir)
+    await db.commit()
+    return linhas
+
+@app.get("/admin/metricas", response_class=PlainTextResponse, tags=["Administração"])
+async def metricas_prometheus():
+    estatisticas = cache.estatisticas()
+    extras = [
+        (f"youthspace_cache_{nome}", f"Cache de entidades: {nome}", estatisticas[nome])
+        for nome in ("hits", "hits_compartilhado", "misses", "evictions", "expirados", "invalidacoes", "itens")
+    ]
+    extras += instrumentacao.partida.metricas()
+    return instrumentacao.metricas.prometheus(extras)
+
+instrumentacao.partida.marcar("import")
 
 # ----------------- EXECUÇÃO -----------------
 if __name__ == "__main__":
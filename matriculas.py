@@ -0,0 +1,174 @@
+import os
+from collections import Counter
+
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+import resumos
+
+# Gravação de matrículas com checagem de vagas, comum à fila
+# (fila_matriculas.py), à matrícula em lote e à importação: as turmas da
+# rodada são travadas juntas (FOR UPDATE no MySQL) e recontadas antes de
+# gravar; quem passa da capacidade vai para a lista de espera ou é recusado,
+# e quem é matriculado sai da espera na mesma transação. O número de
+# consultas por rodada é fixo, qualquer que seja o número de turmas e pares:
+# IN/GROUP BY para ler e executemany para gravar. Funciona com Session
+# síncrona; as rotas chamam via run_sync.
+
+LISTA_ESPERA_MAX = int(os.getenv("LISTA_ESPERA_MAX", "50"))  # por turma
+MAX_PARES_POR_LOTE = 10_000
+
+
+def montar_decisao(id_aluno, id_turma, status, id_matricula=None, posicao=None):
+    return {"id_aluno": id_aluno, "id_turma": id_turma, "status": status,
+            "id_matricula": id_matricula, "posicao": posicao}
+
+
+def validar_matriculas(db: Session, pares):
+    # Duas consultas por lote, qualquer que seja o número de pares: alunos
+    # existentes e pares já matriculados
+    alunos, existentes = set(), set()
+    if pares:
+        alunos = set(db.execute(
+            select(models.Aluno.id_aluno).where(models.Aluno.id_aluno.in_({id_aluno for id_aluno, _ in pares}))
+        ).scalars())
+        existentes = set(db.execute(
+            select(models.Matricula.id_aluno, models.Matricula.id_turma)
+            .where(tuple_(models.Matricula.id_aluno, models.Matricula.id_turma).in_(list(set(pares))))
+        ).tuples())
+    return alunos, existentes
+
+
+def _gravar(db, pedidos_por_turma, matriculas, espera_turmas):
+    # Todas as turmas da rodada de uma vez: um SELECT ... FOR UPDATE em ordem
+    # de id, uma contagem com GROUP BY, uma leitura das listas de espera e um
+    # INSERT com executemany por tabela. matriculas/espera_turmas acumulam as
+    # variações da rodada (resumos.py).
+    capacidades = dict(db.execute(
+        select(models.Turma.id_turma, models.Turma.capacidade)
+        .where(models.Turma.id_turma.in_(pedidos_por_turma))
+        .order_by(models.Turma.id_turma).with_for_update()
+    ).all())
+    ocupadas, espera = Counter(), {}
+    if capacidades:
+        ocupadas.update(dict(db.execute(
+            select(models.Matricula.id_turma, func.count())
+            .where(models.Matricula.id_turma.in_(capacidades)).group_by(models.Matricula.id_turma)
+        ).all()))
+        for id_espera, id_aluno, id_turma in db.execute(
+            select(models.ListaEspera.id_espera, models.ListaEspera.id_aluno, models.ListaEspera.id_turma)
+            .where(models.ListaEspera.id_turma.in_(capacidades)).order_by(models.ListaEspera.id_espera)
+        ):
+            espera.setdefault(id_turma, []).append((id_espera, id_aluno))
+
+    # Vagas abertas (matrícula removida, capacidade aumentada) vão primeiro
+    # para quem está na espera, por ordem de chegada
+    promovidos = []
+    for id_turma, capacidade in capacidades.items():
+        fila = espera.get(id_turma, [])
+        vagas = len(fila) if capacidade is None else max(capacidade - ocupadas[id_turma], 0)
+        for id_espera, id_aluno in fila[:vagas]:
+            promovidos.append((id_espera, id_aluno, id_turma))
+        espera[id_turma] = fila[vagas:]
+        ocupadas[id_turma] += len(fila[:vagas])
+        matriculas[id_turma] += len(fila[:vagas])
+        espera_turmas[id_turma] -= len(fila[:vagas])
+    if promovidos:
+        db.execute(delete(models.ListaEspera).where(
+            models.ListaEspera.id_espera.in_([id_espera for id_espera, _, _ in promovidos])))
+
+    alunos, existentes = validar_matriculas(db, [
+        (id_aluno, id_turma) for id_turma in capacidades
+        for id_aluno in pedidos_por_turma[id_turma] if id_aluno is not None
+    ])
+    resultado = {}
+    novas = []
+    novas_espera = []
+    for id_turma, ids_alunos in pedidos_por_turma.items():
+        if id_turma not in capacidades:
+            resultado[id_turma] = [montar_decisao(a, id_turma, "turma_nao_encontrada") for a in ids_alunos], None
+            continue
+        capacidade = capacidades[id_turma]
+        na_espera = {id_aluno for _, id_aluno in espera[id_turma]}
+        em_espera = len(espera[id_turma])
+        decisoes = []
+        vistos = set()
+        for id_aluno in ids_alunos:
+            if id_aluno is None:  # só rebalanceamento (ver FilaMatriculas.liberar)
+                decisoes.append(None)
+                continue
+            if id_aluno not in alunos:
+                item = montar_decisao(id_aluno, id_turma, "aluno_nao_encontrado")
+            elif (id_aluno, id_turma) in existentes or id_aluno in vistos:
+                item = montar_decisao(id_aluno, id_turma, "ja_matriculado")
+            elif id_aluno in na_espera:
+                item = montar_decisao(id_aluno, id_turma, "ja_na_espera")
+            elif capacidade is None or ocupadas[id_turma] < capacidade:
+                item = montar_decisao(id_aluno, id_turma, "aceita")
+                ocupadas[id_turma] += 1
+                matriculas[id_turma] += 1
+                novas.append((id_aluno, id_turma))
+            elif em_espera < LISTA_ESPERA_MAX:
+                em_espera += 1
+                espera_turmas[id_turma] += 1
+                novas_espera.append((id_aluno, id_turma))
+                item = montar_decisao(id_aluno, id_turma, "lista_espera", posicao=em_espera)
+            else:
+                item = montar_decisao(id_aluno, id_turma, "lotada")
+            vistos.add(id_aluno)
+            decisoes.append(item)
+        resultado[id_turma] = decisoes, (capacidade, ocupadas[id_turma], em_espera)
+
+    if promovidos or novas:
+        db.execute(insert(models.Matricula), [
+            {"id_aluno": id_aluno, "id_turma": id_turma}
+            for id_aluno, id_turma in [(a, t) for _, a, t in promovidos] + novas
+        ])
+    if novas_espera:
+        db.execute(insert(models.ListaEspera), [{"id_aluno": a, "id_turma": t} for a, t in novas_espera])
+    if novas:
+        ids = {(a, t): id_matricula for a, t, id_matricula in db.execute(
+            select(models.Matricula.id_aluno, models.Matricula.id_turma, models.Matricula.id_matricula)
+            .where(tuple_(models.Matricula.id_aluno, models.Matricula.id_turma).in_(novas))
+        )}
+        for decisoes, _ in resultado.values():
+            for item in decisoes:
+                if item is not None and item["status"] == "aceita":
+                    item["id_matricula"] = ids.get((item["id_aluno"], item["id_turma"]))
+    return resultado
+
+
+def gravar_rodada(db, pedidos_por_turma, tentativas=2):
+    # {id_turma: [id_aluno, ...]} -> {id_turma: (decisões, (capacidade,
+    # ocupadas, espera))}. Uma transação, com as turmas travadas em ordem de
+    # id (evita deadlock entre workers). Em IntegrityError (outra escrita
+    # gravou o mesmo par no meio), revalida tudo.
+    for tentativa in range(tentativas):
+        matriculas, espera = Counter(), Counter()
+        try:
+            resultado = _gravar(db, pedidos_por_turma, matriculas, espera)
+            resumos.registrar_matriculas(db, matriculas, espera)
+            db.commit()
+            return resultado
+        except IntegrityError:
+            db.rollback()
+            if tentativa == tentativas - 1:
+                raise
+
+
+def matricular_em_lote(db, pares):
+    # Decisões na ordem dos pares; as aceitas aparecem como "criada"
+    pedidos = {}
+    for id_aluno, id_turma in pares:
+        pedidos.setdefault(id_turma, []).append(id_aluno)
+    gravados = gravar_rodada(db, pedidos)
+    decisoes = {id_turma: iter(itens) for id_turma, (itens, _) in gravados.items()}
+    resultados = []
+    for _, id_turma in pares:
+        item = next(decisoes[id_turma])
+        if item["status"] == "aceita":
+            item["status"] = "criada"
+        resultados.append(item)
+    return resultados
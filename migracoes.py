@@ -0,0 +1,160 @@
+import argparse
+import logging
+import os
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text
+from sqlalchemy.exc import IntegrityError
+
+import models
+import resumos
+from database import engine
+
+# Migrações versionadas do esquema. O app não cria mais tabelas no import:
+# rode `python -m migracoes` uma vez por deploy, antes de subir os workers
+# (ou MIGRAR_NA_INICIALIZACAO=1 em desenvolvimento). Cada migração é
+# idempotente, pode rodar de novo num banco que já tenha a mudança, e a
+# versão aplicada fica registrada em esquema_versoes.
+
+logger = logging.getLogger(__name__)
+
+# Aplica as pendentes no startup do app (um worker só, em desenvolvimento)
+MIGRAR_NA_INICIALIZACAO = os.getenv("MIGRAR_NA_INICIALIZACAO", "0") == "1"
+
+_metadata = MetaData()
+esquema_versoes = Table(
+    "esquema_versoes", _metadata,
+    Column("versao", Integer, primary_key=True, autoincrement=False),
+    Column("descricao", String(255), nullable=False),
+    Column("aplicada_em", DateTime, server_default=func.now()),
+)
+
+
+def _colunas(conexao, tabela):
+    return {coluna["name"] for coluna in inspect(conexao).get_columns(tabela)}
+
+
+def _indices(conexao, tabela):
+    return {indice["name"] for indice in inspect(conexao).get_indexes(tabela)}
+
+
+def _tabelas_iniciais(conexao):
+    # create_all só cria o que falta (checkfirst), então serve também para
+    # bancos criados antes das migrações; tabelas que já existiam não mudam
+    # (índices e chaves novos delas ficam com as migrações seguintes)
+    models.Base.metadata.create_all(conexao)
+
+
+def _capacidade_turmas(conexao):
+    if "capacidade" not in _colunas(conexao, "turmas"):
+        conexao.execute(text("ALTER TABLE turmas ADD COLUMN capacidade INTEGER"))
+
+
+def _resumos_matriculas(conexao):
+    # Cria as tabelas de resumo e preenche a partir dos dados existentes
+    tabelas = [modelo.__table__ for modelo, _, _ in resumos.DIMENSOES.values()]
+    models.Base.metadata.create_all(conexao, tables=tabelas)
+    resumos.reconstruir(conexao)
+
+
+def _indices_status(conexao):
+    # Filtros por status (listagens, exclusões em massa)
+    for tabela in (models.Aluno.__table__, models.Turma.__table__):
+        nome = f"ix_{tabela.name}_status"
+        if nome not in _indices(conexao, tabela.name):
+            next(indice for indice in tabela.indexes if indice.name == nome).create(conexao)
+
+
+# (tabela, coluna) das chaves estrangeiras com ON DELETE CASCADE nos modelos
+CHAVES_EM_CASCATA = [
+    ("turmas", "id_curso"),
+    ("matriculas", "id_aluno"),
+    ("matriculas", "id_turma"),
+    ("lista_espera", "id_aluno"),
+    ("lista_espera", "id_turma"),
+]
+
+
+def _chaves_em_cascata(conexao):
+    # Só no MySQL: o SQLite não altera restrições de tabela existente (e sem
+    # PRAGMA foreign_keys não aplica a cascata; exclusoes.py apaga os
+    # dependentes de qualquer forma)
+    if conexao.dialect.name != "mysql":
+        return
+    inspetor = inspect(conexao)
+    for tabela, coluna in CHAVES_EM_CASCATA:
+        for chave in inspetor.get_foreign_keys(tabela):
+            if chave["constrained_columns"] != [coluna]:
+                continue
+            if (chave.get("options") or {}).get("ondelete", "").upper() == "CASCADE":
+                continue
+            destino = f"{chave['referred_table']} ({', '.join(chave['referred_columns'])})"
+            conexao.execute(text(f"ALTER TABLE {tabela} DROP FOREIGN KEY {chave['name']}"))
+            conexao.execute(text(
+                f"ALTER TABLE {tabela} ADD CONSTRAINT {chave['name']} "
+                f"FOREIGN KEY ({coluna}) REFERENCES {destino} ON DELETE CASCADE"
+            ))
+
+
+MIGRACOES = [
+    (1, "Tabelas iniciais", _tabelas_iniciais),
+    (2, "Capacidade das turmas", _capacidade_turmas),
+    (3, "Resumos de matrículas", _resumos_matriculas),
+    (4, "Índices de status de alunos e turmas", _indices_status),
+    (5, "ON DELETE CASCADE nas chaves estrangeiras (MySQL)", _chaves_em_cascata),
+]
+VERSAO_MAIS_RECENTE = MIGRACOES[-1][0]
+
+
+def versao_atual(conexao):
+    esquema_versoes.create(conexao, checkfirst=True)
+    return conexao.execute(select(func.max(esquema_versoes.c.versao))).scalar() or 0
+
+
+def migrar(motor=engine, ate=None):
+    with motor.begin() as conexao:
+        atual = versao_atual(conexao)
+    aplicadas = []
+    for versao, descricao, funcao in MIGRACOES:
+        if versao <= atual or (ate is not None and versao > ate):
+            continue
+        try:
+            with motor.begin() as conexao:
+                funcao(conexao)
+                conexao.execute(insert(esquema_versoes).values(versao=versao, descricao=descricao))
+        except IntegrityError:
+            # Outro worker registrou a mesma versão primeiro; como as
+            # migrações são idempotentes, basta seguir
+            continue
+        logger.info("Migração %s aplicada: %s", versao, descricao)
+        aplicadas.append(versao)
+    return aplicadas
+
+
+def pendentes(motor=engine):
+    with motor.begin() as conexao:
+        atual = versao_atual(conexao)
+    return [(versao, descricao) for versao, descricao, _ in MIGRACOES if versao > atual]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m migracoes", description="Migrações do esquema do Youth Space.")
+    sub = parser.add_subparsers(dest="comando")
+    p_aplicar = sub.add_parser("aplicar", help="aplica as migrações pendentes (padrão)")
+    p_aplicar.add_argument("--ate", type=int, help="para nesta versão")
+    sub.add_parser("status", help="mostra a versão atual e as pendentes")
+    args = parser.parse_args()
+
+    if args.comando == "status":
+        faltando = pendentes()
+        print(f"Versão mais recente: {VERSAO_MAIS_RECENTE}")
+        for versao, descricao in faltando:
+            print(f"pendente: {versao} - {descricao}")
+        if not faltando:
+            print("Esquema em dia")
+        return
+    aplicadas = migrar(ate=getattr(args, "ate", None))
+    print(f"Migrações aplicadas: {', '.join(map(str, aplicadas))}" if aplicadas else "Nada a aplicar")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,42 +18,85 @@ class Aluno(Base):
     nome = Column(String(255), nullable=False)
     email = Column(String(255), unique=True, nullable=False, index=True)
     senha = Column(String(255), unique=True, nullable=False)
-    status = Column(String(50), nullable=False, default='ativo')
-    matriculas = relationship("Matricula", back_populates="aluno", cascade="all, delete-orphan")
+    status = Column(String(50), nullable=False, default='ativo', index=True)
+    matriculas = relationship("Matricula", back_populates="aluno", cascade="all, delete-orphan", passive_deletes=True)
+    espera = relationship("ListaEspera", cascade="all, delete-orphan", passive_deletes=True)
 
 class Curso(Base):
     __tablename__ = "cursos"
     id_curso = Column(Integer, primary_key=True, index=True)
     nome = Column(String(255), unique=True, nullable=False, index=True)
     descricao = Column(Text)
-    turmas = relationship("Turma", back_populates="curso", cascade="all, delete-orphan")
+    turmas = relationship("Turma", back_populates="curso", cascade="all, delete-orphan", passive_deletes=True)
 
 class Turma(Base):
     __tablename__ = "turmas"
     id_turma = Column(Integer, primary_key=True, index=True)
-    id_curso = Column(Integer, ForeignKey("cursos.id_curso"), nullable=False)
+    id_curso = Column(Integer, ForeignKey("cursos.id_curso", ondelete="CASCADE"), nullable=False)
     id_professor = Column(Integer, ForeignKey("professores.id_professor"), nullable=False)
     carga_horaria = Column(Integer, nullable=False)
     horario = Column(String(100))
     sala = Column(String(50))
-    status = Column(String(50), nullable=False, default='inscrições abertas')
+    status = Column(String(50), nullable=False, default='inscrições abertas', index=True)
+    capacidade = Column(Integer)  # vagas; None = sem limite
     
     curso = relationship("Curso", back_populates="turmas")
     professor = relationship("Professor", back_populates="turmas")
-    matriculas = relationship("Matricula", back_populates="turma", cascade="all, delete-orphan")
+    matriculas = relationship("Matricula", back_populates="turma", cascade="all, delete-orphan", passive_deletes=True)
+    espera = relationship("ListaEspera", cascade="all, delete-orphan", passive_deletes=True)
 
 class Matricula(Base):
     __tablename__ = "matriculas"
     __table_args__ = (UniqueConstraint('id_aluno', 'id_turma', name='_aluno_turma_uc'),)
     id_matricula = Column(Integer, primary_key=True, index=True)
-    id_aluno = Column(Integer, ForeignKey("alunos.id_aluno"), nullable=False)
-    id_turma = Column(Integer, ForeignKey("turmas.id_turma"), nullable=False)
+    id_aluno = Column(Integer, ForeignKey("alunos.id_aluno", ondelete="CASCADE"), nullable=False)
+    id_turma = Column(Integer, ForeignKey("turmas.id_turma", ondelete="CASCADE"), nullable=False)
 
     aluno = relationship("Aluno", back_populates="matriculas")
     turma = relationship("Turma", back_populates="matriculas")
+
+class ListaEspera(Base):
+    # Fila de espera por turma lotada; a ordem de chegada é o id_espera
+    __tablename__ = "lista_espera"
+    __table_args__ = (UniqueConstraint('id_aluno', 'id_turma', name='_espera_aluno_turma_uc'),)
+    id_espera = Column(Integer, primary_key=True, index=True)
+    id_aluno = Column(Integer, ForeignKey("alunos.id_aluno", ondelete="CASCADE"), nullable=False)
+    id_turma = Column(Integer, ForeignKey("turmas.id_turma", ondelete="CASCADE"), nullable=False, index=True)
+
+class ContagensMatriculas:
+    # Contadores das tabelas de resumo, mantidos por resumos.py
+    turmas = Column(Integer, nullable=False, default=0)
+    turmas_sem_limite = Column(Integer, nullable=False, default=0)
+    capacidade = Column(Integer, nullable=False, default=0)  # vagas das turmas com limite
+    matriculas = Column(Integer, nullable=False, default=0)
+    ocupadas = Column(Integer, nullable=False, default=0)  # matrículas nas turmas com limite
+    espera = Column(Integer, nullable=False, default=0)
+
+class ResumoTurma(ContagensMatriculas, Base):
+    __tablename__ = "resumo_turmas"
+    id_turma = Column(Integer, primary_key=True, autoincrement=False)
+
+class ResumoCurso(ContagensMatriculas, Base):
+    __tablename__ = "resumo_cursos"
+    id_curso = Column(Integer, primary_key=True, autoincrement=False)
+
+class ResumoProfessor(ContagensMatriculas, Base):
+    __tablename__ = "resumo_professores"
+    id_professor = Column(Integer, primary_key=True, autoincrement=False)
+
+class ResumoStatus(ContagensMatriculas, Base):
+    __tablename__ = "resumo_status"
+    status = Column(String(50), primary_key=True)
+
 class Usuario(Base):
     __tablename__ = "usuarios"
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(100), nullable=False)
     email = Column(String(100), unique=True, nullable=False)
-    senha = Column(String(255), nullable=False)
\ No newline at end of file
+    senha = Column(String(255), nullable=False)
+
+class VersaoTabela(Base):
+    # Carimbo de versão por tabela, incrementado a cada escrita (ver versoes.py)
+    __tablename__ = "versoes_tabelas"
+    tabela = Column(String(50), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,42 @@
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+
+# Paginação por chave (keyset): em vez de OFFSET, busca a partir do último id
+# visto. O custo de cada página fica constante, não importa quão funda ela seja.
+
+def codificar_cursor(ultimo_id: int) -> str:
+    dados = json.dumps({"id": ultimo_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(dados).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str) -> int:
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        dados = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        return int(dados["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def paginar(query, coluna_id, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    # Com cursor, a busca começa logo após o último id da página anterior
+    # (usa o índice da chave primária). Sem cursor, mantém o skip antigo.
+    query = query.order_by(coluna_id)
+    if cursor:
+        query = query.filter(coluna_id > decodificar_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+def proximo_cursor(itens, atributo_id: str, limit: int) -> Optional[str]:
+    # Página incompleta significa que não há mais registros
+    if not itens or len(itens) < limit:
+        return None
+    return codificar_cursor(getattr(itens[-1], atributo_id))
+
+def definir_cursor(response, itens, atributo_id: str, limit: int):
+    cursor = proximo_cursor(itens, atributo_id, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+    return itens
@@ -0,0 +1,260 @@
+import argparse
+import json
+from collections import Counter
+
+from sqlalchemy import case, delete, func, insert, literal, null, select, update
+
+import models
+
+# Resumo de matrículas por turma, curso, professor e status da turma, para os
+# relatórios da coordenação (GET /analises/matriculas). Cada tabela de resumo
+# guarda os contadores já somados (turmas, vagas, matrículas, espera). As
+# escritas de matrícula e de turma aplicam a diferença na própria transação,
+# com UPDATE ... SET x = x + n, e a leitura não faz COUNT sobre matriculas:
+# o custo é o mesmo qualquer que seja o tamanho da tabela.
+# `python -m resumos reconstruir` recalcula tudo com GROUP BY (depois de cargas
+# feitas direto no banco, por exemplo). As funções recebem Session síncrona;
+# as rotas chamam via run_sync e o commit fica com quem chama.
+# Ordem das travas, a mesma de matriculas.py: linhas das turmas (por id) antes
+# de qualquer linha de resumo.
+
+CAMPOS = ("turmas", "turmas_sem_limite", "capacidade", "matriculas", "ocupadas", "espera")
+
+# dimensão -> (tabela de resumo, chave dela, coluna de Turma que define o grupo)
+DIMENSOES = {
+    "curso": (models.ResumoCurso, models.ResumoCurso.id_curso, models.Turma.id_curso),
+    "professor": (models.ResumoProfessor, models.ResumoProfessor.id_professor, models.Turma.id_professor),
+    "status": (models.ResumoStatus, models.ResumoStatus.status, models.Turma.status),
+    "turma": (models.ResumoTurma, models.ResumoTurma.id_turma, models.Turma.id_turma),
+}
+GRUPOS = ("curso", "professor", "status")
+
+COLUNAS_TURMA = (
+    models.Turma.id_turma, models.Turma.id_curso, models.Turma.id_professor,
+    models.Turma.status, models.Turma.capacidade,
+)
+
+
+def atributos(turma):
+    # A tupla de COLUNAS_TURMA de uma turma carregada pelo ORM
+    return turma.id_turma, turma.id_curso, turma.id_professor, turma.status, turma.capacidade
+
+
+def _parcela(capacidade, turmas=0, matriculas=0, espera=0):
+    # Quanto uma turma soma em cada linha de resumo a que pertence
+    limitada = capacidade is not None
+    return (
+        turmas, 0 if limitada else turmas, (capacidade or 0) * turmas,
+        matriculas, matriculas if limitada else 0, espera,
+    )
+
+
+def _chaves(turma):
+    id_turma, id_curso, id_professor, status, _ = turma
+    return {"curso": id_curso, "professor": id_professor, "status": status, "turma": id_turma}
+
+
+def _somar(variacoes, turma, parcela, dimensoes=DIMENSOES):
+    chaves = _chaves(turma)
+    for dimensao in dimensoes:
+        atual = variacoes.setdefault((dimensao, chaves[dimensao]), [0] * len(CAMPOS))
+        for posicao, valor in enumerate(parcela):
+            atual[posicao] += valor
+
+
+def _aplicar(db, variacoes):
+    # Sempre na ordem (dimensão, chave): duas transações nunca travam as
+    # mesmas linhas de resumo em ordens diferentes
+    for dimensao, chave in sorted(variacoes):
+        valores = dict(zip(CAMPOS, variacoes[(dimensao, chave)]))
+        if not any(valores.values()):
+            continue
+        modelo, coluna, _ = DIMENSOES[dimensao]
+        tabela = modelo.__table__
+        resultado = db.execute(
+            update(tabela).where(tabela.c[coluna.key] == chave)
+            .values({campo: tabela.c[campo] + valor for campo, valor in valores.items() if valor})
+        )
+        if resultado.rowcount == 0:
+            # Grupo novo (primeira turma do curso, status novo...)
+            db.execute(insert(tabela).values({coluna.key: chave, **valores}))
+
+
+def travar_turmas(db, ids_turmas):
+    # SELECT ... FOR UPDATE das turmas em ordem de id (no-op se já travadas)
+    ids_turmas = set(ids_turmas)
+    if not ids_turmas:
+        return
+    db.execute(
+        select(models.Turma.id_turma).where(models.Turma.id_turma.in_(ids_turmas))
+        .order_by(models.Turma.id_turma).with_for_update()
+    ).all()
+
+
+def registrar_matriculas(db, matriculas, espera=None):
+    # matriculas/espera: {id_turma: variação} (negativa na remoção)
+    espera = espera or {}
+    ids_turmas = {id_turma for id_turma, n in (*matriculas.items(), *espera.items()) if n}
+    if not ids_turmas:
+        return
+    travar_turmas(db, ids_turmas)
+    variacoes = {}
+    for turma in db.execute(select(*COLUNAS_TURMA).where(models.Turma.id_turma.in_(ids_turmas))):
+        _somar(variacoes, turma, _parcela(turma[4], 0, matriculas.get(turma[0], 0), espera.get(turma[0], 0)))
+    _aplicar(db, variacoes)
+
+
+def registrar_turma(db, antes, depois):
+    # Turma criada (antes=None) ou alterada; antes/depois são tuplas de
+    # COLUNAS_TURMA. As matrículas da turma mudam de grupo junto com ela.
+    matriculas = espera = 0
+    travar_turmas(db, [depois[0]])
+    if antes is not None:
+        # Trava as linhas de resumo envolvidas na ordem de _aplicar (a da
+        # turma por último) antes de ler as contagens da turma: matrículas
+        # gravadas ao mesmo tempo esperam o commit em vez de se perderem
+        envolvidas = {item for turma in (antes, depois) for item in _chaves(turma).items()}
+        for dimensao, chave in sorted(envolvidas):
+            modelo, coluna, _ = DIMENSOES[dimensao]
+            tabela = modelo.__table__
+            contagem = db.execute(
+                select(tabela.c.matriculas, tabela.c.espera)
+                .where(tabela.c[coluna.key] == chave).with_for_update()
+            ).first()
+            if dimensao == "turma":
+                matriculas, espera = contagem or (0, 0)
+    variacoes = {}
+    if antes is not None:
+        _somar(variacoes, antes, _parcela(antes[4], -1, -matriculas, -espera))
+    _somar(variacoes, depois, _parcela(depois[4], 1, matriculas, espera))
+    _aplicar(db, variacoes)
+
+
+def remover_turmas(db, ids_turmas):
+    # Antes do DELETE das turmas: tira cada uma dos grupos a que pertencia
+    resumo = models.ResumoTurma.__table__
+    travar_turmas(db, ids_turmas)
+    linhas = db.execute(
+        select(*COLUNAS_TURMA, resumo.c.matriculas, resumo.c.espera)
+        .outerjoin(resumo, resumo.c.id_turma == models.Turma.id_turma)
+        .where(models.Turma.id_turma.in_(ids_turmas))
+    )
+    variacoes = {}
+    for *turma, matriculas, espera in linhas:
+        _somar(variacoes, turma, _parcela(turma[4], -1, -(matriculas or 0), -(espera or 0)), GRUPOS)
+    _aplicar(db, variacoes)
+    db.execute(delete(resumo).where(resumo.c.id_turma.in_(ids_turmas)))
+
+
+def reconstruir(db):
+    # Recalcula todas as tabelas de resumo: as turmas a partir de GROUP BY em
+    # matriculas e lista_espera, os grupos a partir das turmas. `db` pode ser
+    # Session ou Connection. No MySQL o DELETE e o INSERT ... SELECT travam as
+    # linhas lidas, então escritas concorrentes esperam e entram depois.
+    for modelo, _, _ in DIMENSOES.values():
+        db.execute(delete(modelo.__table__))
+
+    def por_turma(modelo):
+        return select(modelo.id_turma, func.count().label("total")).group_by(modelo.id_turma).subquery()
+
+    matriculas, espera = por_turma(models.Matricula), por_turma(models.ListaEspera)
+    total_matriculas = func.coalesce(matriculas.c.total, 0)
+    limitada = models.Turma.capacidade.is_not(None)
+    db.execute(insert(models.ResumoTurma.__table__).from_select(
+        ["id_turma", *CAMPOS],
+        select(
+            models.Turma.id_turma, literal(1), case((limitada, 0), else_=1),
+            func.coalesce(models.Turma.capacidade, 0), total_matriculas,
+            case((limitada, total_matriculas), else_=0), func.coalesce(espera.c.total, 0),
+        )
+        .outerjoin(matriculas, matriculas.c.id_turma == models.Turma.id_turma)
+        .outerjoin(espera, espera.c.id_turma == models.Turma.id_turma)
+    ))
+
+    resumo = models.ResumoTurma.__table__
+    for dimensao in GRUPOS:
+        modelo, coluna, coluna_turma = DIMENSOES[dimensao]
+        db.execute(insert(modelo.__table__).from_select(
+            [coluna.key, *CAMPOS],
+            select(coluna_turma, *(func.sum(resumo.c[campo]) for campo in CAMPOS))
+            .join(resumo, resumo.c.id_turma == models.Turma.id_turma)
+            .group_by(coluna_turma)
+        ))
+    return {
+        dimensao: db.execute(select(func.count()).select_from(modelo.__table__)).scalar_one()
+        for dimensao, (modelo, _, _) in DIMENSOES.items()
+    }
+
+
+# ----------------- LEITURA -----------------
+def consulta(por):
+    # (SELECT, coluna de paginação) da rota de análises. Cursos e professores
+    # sem turmas aparecem zerados; status só os que têm turmas.
+    modelo, coluna, _ = DIMENSOES[por]
+    contagens = [func.coalesce(getattr(modelo, campo), 0).label(campo) for campo in CAMPOS]
+    if por == "curso":
+        query = select(models.Curso.id_curso.label("chave"), models.Curso.nome.label("nome"), *contagens)
+        return query.outerjoin(modelo, coluna == models.Curso.id_curso), models.Curso.id_curso
+    if por == "professor":
+        query = select(models.Professor.id_professor.label("chave"), models.Professor.nome.label("nome"), *contagens)
+        return query.outerjoin(modelo, coluna == models.Professor.id_professor), models.Professor.id_professor
+    if por == "turma":
+        query = (
+            select(models.Turma.id_turma.label("chave"), models.Curso.nome.label("nome"), *contagens)
+            .join(models.Curso, models.Curso.id_curso == models.Turma.id_curso)
+            .outerjoin(modelo, coluna == models.Turma.id_turma)
+        )
+        return query, models.Turma.id_turma
+    query = select(coluna.label("chave"), null().label("nome"), *contagens).where(modelo.turmas > 0)
+    return query.order_by(coluna), None
+
+
+def grupo(linha):
+    item = dict(linha._mapping)
+    item["ocupacao"] = round(item["ocupadas"] / item["capacidade"], 4) if item["capacidade"] else None
+    return item
+
+
+# ----------------- LINHA DE COMANDO -----------------
+def _fotografar(db):
+    fotos = {}
+    for dimensao, (modelo, coluna, _) in DIMENSOES.items():
+        tabela = modelo.__table__
+        fotos[dimensao] = {
+            linha[0]: tuple(linha[1:])
+            for linha in db.execute(select(tabela.c[coluna.key], *(tabela.c[campo] for campo in CAMPOS)))
+        }
+    return fotos
+
+
+def main():
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(prog="python -m resumos", description="Resumos de matrículas do Youth Space.")
+    sub = parser.add_subparsers(dest="comando")
+    sub.add_parser("reconstruir", help="recalcula as tabelas de resumo com GROUP BY (padrão)")
+    sub.add_parser("conferir", help="compara os resumos gravados com um recálculo, sem gravar")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.comando == "conferir":
+            # Linha ausente e linha zerada contam como iguais
+            zeros = (0,) * len(CAMPOS)
+            gravados = _fotografar(db)
+            reconstruir(db)
+            divergentes = Counter(dimensao for dimensao, linhas in _fotografar(db).items()
+                                  for chave in linhas.keys() | gravados[dimensao].keys()
+                                  if linhas.get(chave, zeros) != gravados[dimensao].get(chave, zeros))
+            db.rollback()
+            print(json.dumps({dimensao: divergentes[dimensao] for dimensao in DIMENSOES}, indent=2))
+            return
+        linhas = reconstruir(db)
+        db.commit()
+    finally:
+        db.close()
+    print(json.dumps(linhas, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from pydantic import BaseModel, EmailStr
 
+def serializar(schema, objeto):
+    # Converte um objeto ORM no dict de resposta (Pydantic 1 ou 2)
+    if hasattr(schema, "model_validate"):
+        return schema.model_validate(objeto, from_attributes=True).model_dump()
+    return schema.from_orm(objeto).dict()
+
 # --- Schemas para Professor ---
 class ProfessorBase(BaseModel):
     nome: str
@@ -54,9 +60,19 @@ class TurmaBase(BaseModel):
     horario: Optional[str] = None
     sala: Optional[str] = None
     status: Optional[str] = 'inscrições abertas'
+    capacidade: Optional[int] = None
 
 class TurmaCreate(TurmaBase): pass
 
+class TurmaUpdate(BaseModel):
+    id_curso: Optional[int] = None
+    id_professor: Optional[int] = None
+    carga_horaria: Optional[int] = None
+    horario: Optional[str] = None
+    sala: Optional[str] = None
+    status: Optional[str] = None
+    capacidade: Optional[int] = None
+
 class TurmaSchema(TurmaBase):
     id_turma: int
     class Config: orm_mode = True
@@ -80,3 +96,117 @@ class TurmaDetalhesSchema(TurmaSchema):
 class MatriculaDetalhesSchema(MatriculaSchema):
     aluno: AlunoSchema
     turma: TurmaDetalhesSchema
+
+class MatriculaLoteCreate(BaseModel):
+    # Matricula todos os alunos listados em todas as turmas listadas
+    id_alunos: List[int]
+    id_turmas: List[int]
+
+class ItemLoteMatricula(BaseModel):
+    id_aluno: int
+    id_turma: int
+    status: str
+    id_matricula: Optional[int] = None
+    posicao: Optional[int] = None  # na lista de espera
+
+class MatriculaLoteResultado(BaseModel):
+    criadas: int
+    itens: List[ItemLoteMatricula]
+
+class DecisaoMatricula(BaseModel):
+    # Resposta da fila de matrículas: aceita, lista_espera ou lotada
+    id_aluno: int
+    id_turma: int
+    status: str
+    id_matricula: Optional[int] = None
+    posicao: Optional[int] = None
+
+class VagasTurma(BaseModel):
+    id_turma: int
+    capacidade: Optional[int] = None
+    ocupadas: int
+    espera: int
+
+class RemocaoLote(BaseModel):
+    ids: List[int]
+
+class RemocaoLoteResultado(BaseModel):
+    removidos: List[int]
+    nao_encontrados: List[int]
+
+# --- Schemas para Grade de Horários ---
+class ItemGrade(BaseModel):
+    # id_turma preenchido = turma existente sendo remanejada
+    id_turma: Optional[int] = None
+    id_professor: int
+    sala: Optional[str] = None
+    horario: str
+
+class GradeValidacao(BaseModel):
+    turmas: List[ItemGrade]
+    # False = grade nova (ex.: próximo semestre), só checa conflitos entre os itens
+    considerar_existentes: bool = True
+
+class ConflitoHorario(BaseModel):
+    recurso: str
+    id_turma: Optional[int] = None
+    indice: Optional[int] = None  # outro item da grade enviada
+    horario: Optional[str] = None
+
+class ResultadoGrade(BaseModel):
+    indice: int
+    id_turma: Optional[int] = None
+    horario: Optional[str] = None
+    erro: Optional[str] = None
+    conflitos: List[ConflitoHorario] = []
+
+class ValidacaoGrade(BaseModel):
+    valida: bool
+    itens: List[ResultadoGrade]
+
+class RosterTurmaSchema(BaseModel):
+    id_turma: int
+    alunos: List[AlunoSchema]
+
+# --- Schemas para Análises ---
+class GrupoMatriculas(BaseModel):
+    # chave: id do curso/professor/turma ou o status da turma
+    chave: Union[int, str]
+    nome: Optional[str] = None
+    turmas: int
+    turmas_sem_limite: int
+    capacidade: int  # vagas somadas das turmas com limite
+    matriculas: int
+    ocupadas: int  # matrículas nas turmas com limite
+    espera: int
+    ocupacao: Optional[float] = None  # ocupadas / capacidade
+
+# --- Schemas para Busca ---
+class ResultadoBusca(BaseModel):
+    tipo: str
+    id: int
+    nome: Optional[str] = None
+    detalhe: Optional[str] = None
+    pontuacao: int
+
+class PaginaBusca(BaseModel):
+    total: int
+    itens: List[ResultadoBusca]
+
+# --- Schemas para Importação em Lote ---
+class AlunoImportacao(AlunoBase):
+    senha: str
+
+class ProfessorImportacao(ProfessorBase):
+    senha: str
+
+class ErroImportacao(BaseModel):
+    linha: int
+    erro: str
+
+class RelatorioImportacao(BaseModel):
+    total: int
+    inseridos: int
+    em_espera: int = 0
+    total_erros: int
+    erros: List[ErroImportacao]
@@ -0,0 +1,89 @@
+import json
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+import instrumentacao
+from paginacao import definir_cursor
+
+try:
+    import orjson
+except ImportError:  # codificador rápido é opcional
+    orjson = None
+
+# Caminho rápido de serialização para listas grandes (?rapido=true).
+# Em vez de carregar objetos ORM e validar cada linha pelo schema Pydantic,
+# a consulta seleciona só as colunas que o schema de resposta expõe (com
+# junções para os schemas aninhados) e as tuplas viram dicts diretamente,
+# na mesma ordem de campos que o Pydantic produziria.
+
+
+class RespostaJSON(JSONResponse):
+    # Usa orjson quando instalado; o fallback gera a mesma saída do JSONResponse
+    def render(self, content):
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _campos(schema):
+    # Pydantic 2 (model_fields) ou 1 (__fields__), na ordem de declaração
+    if hasattr(schema, "model_fields"):
+        return [(nome, campo.annotation) for nome, campo in schema.model_fields.items()]
+    return [(nome, campo.type_) for nome, campo in schema.__fields__.items()]
+
+
+def _aninhado(tipo):
+    return isinstance(tipo, type) and issubclass(tipo, BaseModel)
+
+
+class Projecao:
+    def __init__(self, schema, modelo):
+        self.modelo = modelo
+        self.colunas = []
+        self.juncoes = []
+        self.montar = self._planejar(schema, modelo, "")
+
+    def _planejar(self, schema, origem, prefixo):
+        partes = []
+        for nome, tipo in _campos(schema):
+            if _aninhado(tipo):
+                relacao = getattr(origem, nome)
+                alvo = aliased(relacao.property.mapper.class_)
+                self.juncoes.append(relacao.of_type(alvo))
+                partes.append((nome, self._planejar(tipo, alvo, f"{prefixo}{nome}__")))
+            else:
+                # O rótulo do nível de cima é o próprio nome do campo, o que
+                # permite ler linha.id_xxx (usado pelo cursor da paginação)
+                partes.append((nome, len(self.colunas)))
+                self.colunas.append(getattr(origem, nome).label(prefixo + nome))
+
+        def montar(linha):
+            return {nome: (linha[parte] if type(parte) is int else parte(linha)) for nome, parte in partes}
+        return montar
+
+    def select(self):
+        query = select(*self.colunas).select_from(self.modelo)
+        for juncao in self.juncoes:
+            query = query.outerjoin(juncao)
+        return query
+
+    def dicts(self, linhas):
+        # Tuplas não passam pelo evento "load" do ORM: contadas aqui
+        instrumentacao.somar_linhas(len(linhas))
+        montar = self.montar
+        return [montar(linha) for linha in linhas]
+
+
+def responder(response, dados):
+    # Devolve a resposta direto, levando os cabeçalhos já definidos pela rota
+    # (X-Next-Cursor, ETag), que o FastAPI só mescla quando ele serializa
+    return RespostaJSON(dados, headers=dict(response.headers))
+
+
+async def listar(db, response, projecao, query, atributo_id, limit):
+    linhas = (await db.execute(query)).all()
+    definir_cursor(response, linhas, atributo_id, limit)
+    return responder(response, projecao.dicts(linhas))
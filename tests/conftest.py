@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Os módulos do app ficam na raiz do repositório e criam o engine no import:
+# os testes usam um SQLite em memória
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,33 @@
+import asyncio
+
+import cache
+
+
+def _rodar(corotina):
+    return asyncio.run(corotina)
+
+
+def test_entrada_de_outra_versao_e_descartada():
+    async def cenario():
+        compartilhado = cache.BackendLocal()
+        worker_a = cache.CacheEntidades(compartilhado=compartilhado)
+        worker_b = cache.CacheEntidades(compartilhado=compartilhado)
+        await worker_a.guardar("curso", 1, {"descricao": "v1"}, 'W/"1"')
+        assert await worker_b.obter("curso", 1, 'W/"1"') == {"descricao": "v1"}
+        # worker_a grava e invalida; o L1 de worker_b ainda tem a v1
+        await worker_a.invalidar("curso", 1)
+        await worker_a.guardar("curso", 1, {"descricao": "v2"}, 'W/"2"')
+        assert await worker_b.obter("curso", 1, 'W/"2"') == {"descricao": "v2"}
+
+    _rodar(cenario())
+
+
+def test_preenchimento_atrasado_nao_volta_para_a_versao_nova():
+    async def cenario():
+        entidades = cache.CacheEntidades()
+        # Leitura começou na versão 1 e só gravou depois da escrita (versão 2)
+        await entidades.guardar("curso", 1, {"descricao": "v1"}, 'W/"1"')
+        assert await entidades.obter("curso", 1, 'W/"2"') is None
+        assert entidades.estatisticas()["descartados"] == 1
+
+    _rodar(cenario())
@@ -0,0 +1,51 @@
+import pytest
+from fastapi import HTTPException
+
+import horarios
+import main
+
+
+def _formatado(texto):
+    return horarios.formatar(horarios.interpretar(texto))
+
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("seg/qua 08:00-10:00", "seg 08:00-10:00; qua 08:00-10:00"),
+    ("Terça e quinta 14h às 16h", "ter 14:00-16:00; qui 14:00-16:00"),
+    ("segunda-feira 8h30-10h", "seg 08:30-10:00"),
+    ("sábado 9h-12h", "sab 09:00-12:00"),
+])
+def test_dias_por_nome_ou_abreviados(texto, esperado):
+    assert _formatado(texto) == esperado
+
+
+@pytest.mark.parametrize("texto, dias", [
+    ("seg a sex 08:00-10:00", ["seg", "ter", "qua", "qui", "sex"]),
+    ("seg-qua 08:00-10:00", ["seg", "ter", "qua"]),
+    ("seg até qua 08:00-10:00", ["seg", "ter", "qua"]),
+    ("segunda-feira a quarta-feira 08:00-10:00", ["seg", "ter", "qua"]),
+    ("seg a qua, sex 08:00-10:00", ["seg", "ter", "qua", "sex"]),
+    ("sab-dom 08:00-10:00", ["sab", "dom"]),
+])
+def test_faixas_de_dias_sao_expandidas(texto, dias):
+    assert _formatado(texto) == "; ".join(f"{dia} 08:00-10:00" for dia in dias)
+
+
+@pytest.mark.parametrize("texto", [
+    "segxyz 08:00-10:00",
+    "segundaa 08:00-10:00",
+    "s 08:00-10:00",
+    "sex a seg 08:00-10:00",
+    "seg a 08:00-10:00",
+    "seg-ter-qua 08:00-10:00",
+    "seg a qua, ter 08:00-10:00",
+])
+def test_dias_invalidos(texto):
+    with pytest.raises(horarios.HorarioInvalido):
+        horarios.interpretar(texto)
+
+
+def test_horario_invalido_responde_422():
+    with pytest.raises(HTTPException) as erro:
+        main._interpretar_horario("segxyz 08:00-10:00")
+    assert erro.value.status_code == 422
@@ -0,0 +1,164 @@
+import logging
+import os
+import time
+
+from fastapi import Response
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from database import sessao_async
+
+# GET condicional (ETag / If-None-Match) com base em carimbos de versão por
+# tabela. Cada handler de escrita incrementa a versão das tabelas que alterou
+# na mesma transação; as rotas de leitura montam o ETag a partir dessas
+# versões (uma consulta pela chave primária de uma tabela minúscula) e
+# respondem 304 antes de rodar a consulta principal e a serialização.
+# Como as versões ficam no banco, valem para todos os workers e réplicas.
+# Para o GET condicional, cada processo guarda as versões em memória por
+# VERSOES_TTL segundos: um acerto do cache de entidades não custa nenhuma
+# consulta. As escritas do próprio processo descartam a cópia no commit;
+# as de outros workers aparecem em até VERSOES_TTL.
+
+logger = logging.getLogger(__name__)
+
+TABELAS = ("professores", "alunos", "cursos", "turmas")
+
+VERSOES_TTL = float(os.getenv("VERSOES_TTL", "1"))
+
+
+class VersoesEmMemoria:
+    # Usado a partir do event loop (leitura) e do commit das sessões
+    # (descarte); operações simples de dict, sem await no meio
+    def __init__(self, ttl=VERSOES_TTL):
+        self.ttl = ttl
+        self._valores = {}
+        self._geracao = 0
+
+    def obter(self, tabelas):
+        agora = time.monotonic()
+        versoes = {}
+        for tabela in tabelas:
+            item = self._valores.get(tabela)
+            if item is None or item[0] < agora:
+                return None
+            versoes[tabela] = item[1]
+        return versoes
+
+    def marcar(self):
+        return self._geracao
+
+    def guardar(self, versoes, geracao):
+        # Lidas antes de um descarte: podem ser anteriores ao commit
+        if geracao != self._geracao:
+            return
+        expira_em = time.monotonic() + self.ttl
+        self._valores.update((tabela, (expira_em, versao)) for tabela, versao in versoes.items())
+
+    def descartar(self, tabelas):
+        self._geracao += 1
+        for tabela in tabelas:
+            self._valores.pop(tabela, None)
+
+
+em_memoria = VersoesEmMemoria()
+
+
+@event.listens_for(Session, "after_commit")
+def _descartar_alteradas(sessao):
+    alteradas = sessao.info.pop("versoes_alteradas", None)
+    if alteradas:
+        em_memoria.descartar(alteradas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _esquecer_alteradas(sessao):
+    sessao.info.pop("versoes_alteradas", None)
+
+
+def atualizacao(tabelas):
+    return (
+        update(models.VersaoTabela)
+        .where(models.VersaoTabela.tabela.in_(tabelas))
+        .values(versao=models.VersaoTabela.versao + 1)
+    )
+
+
+def incrementar_sync(sessao, *tabelas):
+    sessao.execute(atualizacao(tabelas))
+    sessao.info.setdefault("versoes_alteradas", set()).update(tabelas)
+
+
+async def incrementar(db, *tabelas):
+    # Chamado logo antes do commit, para segurar o lock da linha pelo menor tempo
+    await db.run_sync(incrementar_sync, *tabelas)
+
+
+def consulta(tabelas):
+    return (
+        select(models.VersaoTabela.tabela, models.VersaoTabela.versao)
+        .where(models.VersaoTabela.tabela.in_(tabelas))
+    )
+
+
+def obter_sync(sessao, tabelas):
+    return dict(sessao.execute(consulta(tabelas)).all())
+
+
+async def obter(db, tabelas):
+    # Sempre do banco (dentro da transação de quem chama)
+    linhas = await db.execute(consulta(tabelas))
+    return dict(linhas.all())
+
+
+async def obter_recentes(db, tabelas):
+    # Da memória se a cópia ainda vale; senão do banco
+    versoes = em_memoria.obter(tabelas)
+    if versoes is None:
+        geracao = em_memoria.marcar()
+        versoes = await obter(db, tabelas)
+        em_memoria.guardar(versoes, geracao)
+    return versoes
+
+
+def calcular_etag(tabelas, versoes):
+    return 'W/"' + ".".join(str(versoes.get(tabela, 0)) for tabela in tabelas) + '"'
+
+
+def corresponde(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Comparação fraca: o prefixo W/ é ignorado dos dois lados
+    candidatos = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidatos
+
+
+async def condicional(request, response, db, *tabelas):
+    # Devolve a resposta 304 se o cliente já tem a versão atual; caso
+    # contrário, só marca o ETag na resposta e devolve None. As rotas usam
+    # esse mesmo ETag como versão das entradas do cache de entidades.
+    etag = calcular_etag(tabelas, await obter_recentes(db, tabelas))
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cabecalhos)
+    response.headers.update(cabecalhos)
+    return None
+
+
+async def garantir():
+    # Cria as linhas de versão que faltam (executado na inicialização)
+    async with sessao_async() as db:
+        existentes = set((await db.scalars(select(models.VersaoTabela.tabela))).all())
+        faltantes = [tabela for tabela in TABELAS if tabela not in existentes]
+        if not faltantes:
+            return
+        db.add_all([models.VersaoTabela(tabela=tabela, versao=0) for tabela in faltantes])
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Outro worker criou as linhas ao mesmo tempo
+            await db.rollback()
+            logger.info("Versões de tabela já criadas por outro processo")